@@ -12,87 +12,127 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import astral
+import json
+import math
+import os
 import time
-import arrow
-from difflib import SequenceMatcher
-from ast import literal_eval as parse_tuple
-from pytz import timezone
-from datetime import datetime
+from datetime import date, timedelta
+from functools import partial
+from os.path import join
 
+from mycroft.configuration.config import (
+    LocalConf, USER_CONFIG, Configuration
+)
 from mycroft.messagebus.message import Message
 from mycroft.skills.core import MycroftSkill
 from mycroft.util.log import LOG
 from mycroft.util.parse import normalize
 from mycroft.audio import wait_while_speaking
 from mycroft import intent_handler
-
-
-def _hex_to_rgb(_hex):
-    """ Convert hex color code to RGB tuple
-    Args:
-        hex (str): Hex color string, e.g '#ff12ff' or 'ff12ff'
-    Returns:
-        (rgb): tuple i.e (123, 200, 155) or None
-    """
-    try:
-        if '#' in _hex:
-            _hex = _hex.replace('#', "").strip()
-        if len(_hex) != 6:
-            return None
-        (r, g, b) = int(_hex[0:2], 16), int(_hex[2:4], 16), int(_hex[4:6], 16)
-        return (r, g, b)
-    except Exception:
-        return None
-
-
-def fuzzy_match_color(color_a, color_dict):
-    """ fuzzy match for colors
-
-        Args:
-            color_a (str): color as string
-            color_dict (dict): dict with colors
-        Returns:
-            color: color from color_dict
-    """
-    highest_ratio = float("-inf")
-    _color = None
-    for color, value in color_dict.items():
-        s = SequenceMatcher(None, color_a, color)
-        if s.ratio() > highest_ratio:
-            highest_ratio = s.ratio()
-            _color = color
-    if highest_ratio > 0.8:
-        return _color
-    else:
-        return None
+try:
+    from mycroft.skills.settings import save_settings
+except ImportError:  # older cores, settings are a SkillSettings
+    save_settings = None
+
+from .animation import (IDLE, LISTENING, USER, Animator, FaceState,
+                        Timeline)
+from .brightness import BrightnessCurve, BrightnessParser
+from .busy import HandlerTimes, HandlerTracker
+from .colors import ColorIndex, ColorTable, CustomColorParser, lighten
+from .eyes import (EYE_ANIMATIONS, EYE_PIXELS, EYE_WRITES, FACE_RESETS,
+                   EyeFramebuffer)
+from .gamma import LedCurve, parse_gamma
+from .lazy import Lazy
+from .metrics import Metrics
+from .reconciler import SettingsReconciler
+from .solar import SolarCache, warm_up as warm_up_solar
+from .tables import LocaleTables, compile_table, entity_file, read_table
+from .timers import TimerThread
+from .writebehind import WriteBehind
 
 
 class Mark1(MycroftSkill):
 
-    IDLE_CHECK_FREQUENCY = 6  # in seconds
+    IDLE_START_DELAY = 60  # in seconds
+    IDLE_LOWER_DELAY = 12  # seconds of inactivity before lowering the eyes
+    IDLE_DIM_DELAY = 18    # seconds of inactivity before dimming the eyes
+    THINK_DELAY = 0.25  # seconds before a busy handler shows the hourglass
+    FACE_MAX_TRANSITION = 10  # seconds, longest mark1.face.apply transition
+    HANDLER_TIMES_WRITE_DELAY = 60  # seconds, learned times are saved lazily
+    HANDLER_TIMES_MAX_DELAY = 60  # but at least once a minute while busy
+    AUTO_BRIGHTNESS_MAX_WAIT = 15 * 60  # in seconds
+    METRICS_LOG_INTERVAL = 0  # minutes between metrics in the log, 0 is off
+    SETTINGS_WRITE_DELAY = 5  # seconds without changes before saving
+    # Handlers never showing the busy visual, this skill and the clock
+    BUSY_IGNORE = ('Mark1', 'TimeSkill.update_display')
+
+    EYE_MESSAGES = EYE_WRITES + EYE_ANIMATIONS + FACE_RESETS
+
+    # Eye pixels lit when the eyes are lowered by the 'sleep' visual
+    LOWERED_PIXELS = (3, 8, 15, 20)
+    # Eye pixels lit (dimmed) in the 'inattentive' visual
+    INATTENTIVE_PIXELS = tuple(range(3, 9)) + tuple(range(15, 21))
+    # Perceived brightness of the dimmed pixels
+    INATTENTIVE_DIM = 0.5
+    # Perceived brightness of a "darker" color and white added to a
+    # "lighter" one
+    SHADE_DIM = 0.7
+    SHADE_LIGHTEN = 0.4
 
     def __init__(self):
+        self._load_start = time.monotonic()
         super(Mark1, self).__init__("Mark1")
         self.should_converse = False
         self._settings_loaded = False
         self.converse_context = None
         self.idle_count = 99
-        self.hourglass_info = {}
+        self._idle_timer = None
+        self._last_activity = time.monotonic()
+        self.hourglass_info = HandlerTracker(Mark1.BUSY_IGNORE)
+        self.handler_times = HandlerTimes()
+        self.pending_think = {}
         self.interaction_id = 0
         self._current_color = (34, 167, 240)  # Mycroft blue
-
-        self.settings['auto_brightness'] = False
-        self.settings['auto_dim_eyes'] = True
-        self.settings['use_listening_beep'] = True
-        self.settings['eye color'] = "default"
-        self.settings['current_eye_color'] = self.settings['eye color']
+        self.solar = SolarCache()
+        self.auto_brightness = False
+        self._auto_brightness_timer = None
+        self._brightness_level = None
+        self.metrics = Metrics()
+        self._bus_handlers = []
+        self._metrics_log_timer = None
 
     def initialize(self):
         # Initialize...
-        self.brightness_dict = self.translate_namedvalues('brightness.levels')
-        self.color_dict = self.translate_namedvalues('colors')
-        self.settings['web eye color'] = self.settings['eye color']
+        self.timers = TimerThread(log=self.log, metrics=self.metrics)
+        # Slow jobs, like loading the tables, never hold up the timers
+        self.background = TimerThread(name='Mark1Background', log=self.log)
+        # Settings live in memory, the file is written once changes stop
+        self.settings_writer = WriteBehind(self._store_settings, self.timers,
+                                           delay=Mark1.SETTINGS_WRITE_DELAY,
+                                           log=self.log)
+        self._load_handler_times()
+        self.handler_times_writer = WriteBehind(
+            self._store_handler_times, self.timers,
+            delay=Mark1.HANDLER_TIMES_WRITE_DELAY,
+            max_delay=Mark1.HANDLER_TIMES_MAX_DELAY, log=self.log)
+        # Stored settings are loaded by now, only fill in what's missing
+        defaults = {
+            'auto_brightness': False,
+            'auto_dim_eyes': True,
+            'use_listening_beep': True,
+            'eye color': 'default',
+            'current_eye_color': 'default'
+        }
+        self._save_settings({key: value for key, value in defaults.items()
+                             if key not in self.settings})
+        self.eyes = EyeFramebuffer(self.enclosure, metrics=self.metrics)
+        self.animator = Animator(self.eyes, log=self.log)
+        # Lookup tables of the LED response, see the led_gamma setting
+        self.led = LedCurve(parse_gamma(self.settings.get('led_gamma')))
+        # The tables of all languages are compiled once and cached on
+        # disk, they are loaded on first use or by the warm up
+        self._locales = Lazy(self._load_locales)
+        self._lang_tables = {}
 
         try:
             # Handle changing the eye color once Mark 1 is ready to go
@@ -109,51 +149,193 @@ class Mark1(MycroftSkill):
             self.start_idle_check()
 
             # Handle the 'busy' visual
-            self.bus.on('mycroft.skill.handler.start',
-                        self.on_handler_started)
-            self.bus.on('mycroft.skill.handler.complete',
-                        self.on_handler_complete)
-
-            self.bus.on('recognizer_loop:audio_output_start',
-                        self.on_handler_interactingwithuser)
-            self.bus.on('enclosure.mouth.think',
-                        self.on_handler_interactingwithuser)
-            self.bus.on('enclosure.mouth.events.deactivate',
-                        self.on_handler_interactingwithuser)
-            self.bus.on('enclosure.mouth.text',
-                        self.on_handler_interactingwithuser)
-
-            self.bus.on('mycroft.ready', self.reset_face)
+            self._listen('mycroft.skill.handler.start',
+                         self.on_handler_started)
+            self._listen('mycroft.skill.handler.complete',
+                         self.on_handler_complete)
+
+            self._listen('recognizer_loop:audio_output_start',
+                         self.on_handler_interactingwithuser)
+            self._listen('enclosure.mouth.think',
+                         self.on_handler_interactingwithuser)
+            self._listen('enclosure.mouth.events.deactivate',
+                         self.on_handler_interactingwithuser)
+            self._listen('enclosure.mouth.text',
+                         self.on_handler_interactingwithuser)
+
+            self._listen('mycroft.ready', self.warm_up)
+            self._listen('mycroft.ready', self.reset_face)
+
+            # Mirror what others do to the eyes
+            for msg_type in Mark1.EYE_MESSAGES:
+                self._listen(msg_type, self.eyes.observe)
+
+            self._listen('mark1.metrics.get', self.handle_metrics_get)
+            self._listen('mark1.face.apply', self.handle_face_apply)
         except Exception:
             LOG.exception('In Mark 1 Skill')
 
-        # TODO: Add MycroftSkill.register_entity_list() and use the
-        #  self.color_dict.keys() instead of duplicating data
-        self.register_entity_file('color.entity')
+        self._register_color_entity()
 
         # Update use of wake-up beep
+        self.config_writer = WriteBehind(self._store_user_config,
+                                         self.timers, log=self.log)
         self._sync_wake_beep_setting()
-
+        self._update_busy_ignore()
+
+        # From now on only react to settings which really change
+        self.reconciler = SettingsReconciler(self.settings, self.timers,
+                                             log=self.log)
+        self.reconciler.register(['eye color'], self._on_eye_color_setting)
+        self.reconciler.register(['auto_dim_eyes'],
+                                 self._on_auto_dim_setting)
+        self.reconciler.register(['use_listening_beep'],
+                                 self._sync_wake_beep_setting)
+        self.reconciler.register(['auto_brightness', 'auto_brightness_min',
+                                  'auto_brightness_max'],
+                                 self._on_auto_brightness_setting)
+        self.reconciler.register(['busy_ignore'], self._update_busy_ignore)
+        self.reconciler.register(['led_gamma'], self._on_led_gamma_setting)
+        self.reconciler.register(['metrics_log_interval'],
+                                 self._schedule_metrics_log)
         self.settings_change_callback = self.on_websettings_changed
+        self._register_gauges()
+        self._schedule_metrics_log()
+
+        self.startup_time = time.monotonic() - self._load_start
+        self.log.info('Mark 1 skill started in {:.0f}ms'.format(
+            self.startup_time * 1000))
+
+    def _load_locales(self):
+        cache_file = join(self.file_system.path, 'tables.json')
+        return LocaleTables(cache_file, log=self.log).load()
+
+    def _build_tables(self, lang):
+        locales = self._locales.get()
+        colors = locales.get(lang, 'colors')
+        if colors is None:
+            # Not shipped with the skill, let mycroft-core look for it
+            colors = compile_table('colors',
+                                   self.translate_namedvalues('colors'))
+        brightness = locales.get(lang, 'brightness')
+        if brightness is None:
+            brightness = compile_table(
+                'brightness', self.translate_namedvalues('brightness.levels'))
+        numbers = self._number_words(lang)
+        return {
+            'brightness': brightness,
+            'brightness_parser': BrightnessParser(
+                brightness, locales.get(lang, 'brightness_words'), numbers),
+            'colors': colors['hex'],
+            'color_table': ColorTable(colors['hex'], colors['rgb']),
+            'color_index': ColorIndex(colors['hex']),
+            'color_parser': CustomColorParser(
+                colors['rgb'], locales.get(lang, 'color_words'), numbers)
+        }
+
+    def _register_color_entity(self):
+        """ Register the {color} entity, generated from the color table
+
+        Only the color names of the active language are read, the other
+        tables are still left for the warm up.
+        """
+        colors = read_table(self.lang, 'colors')
+        if colors is None:
+            colors = compile_table('colors',
+                                   self.translate_namedvalues('colors'))
+        try:
+            path = entity_file(join(self.file_system.path, 'entities',
+                                    self.lang), 'color', colors['hex'])
+        except OSError:
+            self.log.exception('Failed to write the color entity')
+            return
+        self.bus.emit(Message('padatious:register_entity', {
+            'file_name': path,
+            'name': '{}:color'.format(self.skill_id)
+        }))
+
+    def _number_words(self, lang):
+        # Spoken numbers 0-255, e.g. 'twenty five', built once per language
+        from mycroft.util.format import pronounce_number
+        numbers = {}
+        for n in range(256):
+            try:
+                numbers[pronounce_number(n, lang)] = n
+            except Exception:
+                break  # numbers in words unsupported for the language
+        return numbers
+
+    def _tables(self):
+        # Switching language only swaps which tables are used
+        tables = self._lang_tables.get(self.lang)
+        if tables is None:
+            tables = self._lang_tables.setdefault(
+                self.lang, Lazy(partial(self._build_tables, self.lang)))
+        return tables.get()
+
+    @property
+    def brightness_dict(self):
+        return self._tables()['brightness']
+
+    @property
+    def brightness_parser(self):
+        return self._tables()['brightness_parser']
+
+    @property
+    def color_dict(self):
+        return self._tables()['colors']
+
+    @property
+    def colors(self):
+        return self._tables()['color_table']
+
+    @property
+    def color_index(self):
+        return self._tables()['color_index']
+
+    @property
+    def color_parser(self):
+        return self._tables()['color_parser']
+
+    def warm_up(self, message=None):
+        """ Load what was left out of the startup, once the device is up """
+        self.background.schedule(0, self._warm_up)
+
+    def _warm_up(self):
+        start = time.monotonic()
+        self._tables()
+        warm_up_solar()
+        self.log.info('Mark 1 skill warmed up in {:.0f}ms '
+                      '(language tables {:.0f}ms, {} compiled)'.format(
+                          (time.monotonic() - start) * 1000,
+                          (self._locales.load_time or 0) * 1000,
+                          self._locales.get().compiled))
 
     def reset_face(self, message):
-        self.enclosure.mouth_reset()
+        self.animator.play(Timeline().reset('mouth_reset'), USER)
+        # Named colors need the tables, leave loading them to the warm up
+        self.background.schedule(0, self._reset_eye_color)
+
+    def _reset_eye_color(self):
         self.set_eye_color(self.settings['current_eye_color'], initing=True)
 
+    def _listen(self, msg_type, handler):
+        # Like bus.on(), but timed and remembered for shutdown()
+        handler = self.metrics.wrap('bus.' + msg_type, handler)
+        self._bus_handlers.append((msg_type, handler))
+        self.bus.on(msg_type, handler)
+
     def shutdown(self):
         # Gotta clean up manually since not using add_event()
-        self.bus.remove('mycroft.skill.handler.start',
-                        self.on_handler_started)
-        self.bus.remove('mycroft.skill.handler.complete',
-                        self.on_handler_complete)
-        self.bus.remove('recognizer_loop:audio_output_start',
-                        self.on_handler_interactingwithuser)
-        self.bus.remove('enclosure.mouth.think',
-                        self.on_handler_interactingwithuser)
-        self.bus.remove('enclosure.mouth.events.deactivate',
-                        self.on_handler_interactingwithuser)
-        self.bus.remove('enclosure.mouth.text',
-                        self.on_handler_interactingwithuser)
+        for msg_type, handler in self._bus_handlers:
+            self.bus.remove(msg_type, handler)
+        self._bus_handlers = []
+        self.timers.stop()
+        self.background.stop()
+        self.config_writer.flush()
+        self.settings_writer.flush()
+        self.handler_times_writer.flush()
+        self.animator.stop()
         super(Mark1, self).shutdown()
 
     #####################################################################
@@ -161,115 +343,219 @@ class Mark1(MycroftSkill):
 
     def on_handler_started(self, message):
         handler = message.data.get("name", "")
-        # Ignoring handlers from this skill and from the background clock
-        if "Mark1" in handler:
-            return
-        if "TimeSkill.update_display" in handler:
+        # Ignoring handlers from this skill, the background clock and
+        # anything configured in the settings
+        if self.hourglass_info.is_ignored(handler):
             return
 
-        self.hourglass_info[handler] = self.interaction_id
-        time.sleep(0.25)
-        if self.hourglass_info.get(handler) == self.interaction_id:
+        self._note_activity()
+        self.animator.submit(self._handler_started, handler)
+
+    # The busy state (interaction_id, pending_think) is only touched from
+    # the animator thread, the bus handlers submit their changes to it.
+
+    def _handler_started(self, handler):
+        self.hourglass_info.start(handler, self.interaction_id)
+        self._cancel_thinking(handler)
+        # Give the handler a moment to show something itself, as long as
+        # it usually takes to do so
+        delay = self.handler_times.delay(handler, Mark1.THINK_DELAY)
+        if delay is None:
+            self.metrics.count('busy.known_fast')
+        elif delay <= 0:
+            self.metrics.count('busy.known_slow')
+            self._start_thinking(handler, self.interaction_id)
+        else:
+            self.pending_think[handler] = self.timers.schedule(
+                delay, self.animator.submit, self._start_thinking,
+                handler, self.interaction_id)
+
+    def _start_thinking(self, handler, interaction_id):
+        self.pending_think.pop(handler, None)
+        if (self.hourglass_info.get(handler) == interaction_id and
+                self.interaction_id == interaction_id):
             # Nothing has happend to indicate to the user that we are active,
             # so start a thinking interaction
-            self.hourglass_info[handler] = -1
-            self.enclosure.mouth_think()
+            self.hourglass_info.update(handler, -1)
+            self.metrics.count('busy.hourglass')
+            # The mouth only, it waits for eye changes asked for
+            self.animator.play(Timeline().command('mouth_think'), USER)
+
+    def _cancel_thinking(self, handler=None):
+        # Drop the pending hourglass of a handler, or of all handlers
+        handlers = [handler] if handler else list(self.pending_think)
+        for handler in handlers:
+            pending = self.pending_think.pop(handler, None)
+            if pending:
+                pending.cancel()
 
     def on_handler_interactingwithuser(self, message):
+        self._note_activity()
+        hourglass = (message.msg_type == 'enclosure.mouth.think' and
+                     self.eyes.own_echo(message))
+        self.animator.submit(self._interacted, hourglass)
+
+    def _interacted(self, hourglass=False):
         # Every time we do something that the user would notice, increment
         # an interaction counter.
         self.interaction_id += 1
+        # ...and no need to show we are busy anymore
+        self._cancel_thinking()
+        if not hourglass:
+            # Our own hourglass is no answer from the handlers
+            self._learn_handler_times(self.hourglass_info.feedback())
 
     def on_handler_complete(self, message):
         handler = message.data.get("name", "")
-        # Ignoring handlers from this skill and from the background clock
-        if "Mark1" in handler:
-            return
-        if "TimeSkill.update_display" in handler:
+        if self.hourglass_info.is_ignored(handler):
             return
 
-        if handler in self.hourglass_info:
-            if self.hourglass_info[handler] == -1:
-                self.enclosure.reset()
-            self.hourglass_info[handler] = None
+        self._note_activity()
+        self.animator.submit(self._handler_completed, handler)
+
+    def _handler_completed(self, handler):
+        self._cancel_thinking(handler)
+        self._learn_handler_times(self.hourglass_info.feedback(handler))
+        if self.hourglass_info.complete(handler) == -1:
+            self.animator.play(Timeline().reset('reset'), USER)
+
+    def _learn_handler_times(self, waited):
+        # waited holds (handler, seconds before the user noticed anything)
+        for handler, seconds in waited:
+            self.handler_times.record(handler, seconds)
+        if waited:
+            self.handler_times_writer.update(dict(waited))
+
+    def _handler_times_file(self):
+        return join(self.file_system.path, 'handler_times.json')
+
+    def _load_handler_times(self):
+        try:
+            with open(self._handler_times_file()) as f:
+                self.handler_times.load(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError):
+            self.log.warning('Ignoring broken handler times')
+
+    def _store_handler_times(self, changes):
+        path = self._handler_times_file()
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.handler_times.as_dict(), f)
+        os.replace(path + '.tmp', path)
+
+    def _update_busy_ignore(self, changed=None):
+        extra = (self.settings.get('busy_ignore') or '').split(',')
+        self.hourglass_info.set_ignore(Mark1.BUSY_IGNORE + tuple(extra))
 
     #####################################################################
     # Manage "idle" visual state
 
-    def start_idle_check(self):
-        # Clear any existing checker
-        self.cancel_scheduled_event('IdleCheck')
+    def start_idle_check(self, delay=None):
+        """ (Re)start watching for the device to go idle
+
+        Instead of polling, the time of the last activity is noted by the
+        bus handlers and a single timer fires when the next dim stage is
+        due.  Activity seen before then just moves the deadline.
+
+        Runs on the animator thread, which owns the idle state, except
+        during initialize().
+
+        Args:
+            delay (float): seconds before the first check
+        """
+        self._stop_idle_check()
 
         if self.settings['auto_dim_eyes']:
-            # Schedule a check every few seconds
-            self.schedule_repeating_event(self.check_for_idle, 60,
-                                          Mark1.IDLE_CHECK_FREQUENCY,
-                                          name='IdleCheck')
+            self._last_activity = time.monotonic()
+            if delay is None:
+                delay = Mark1.IDLE_START_DELAY
+            self._idle_timer = self.timers.schedule(delay,
+                                                    self.check_for_idle)
+
+    def _stop_idle_check(self):
+        if self._idle_timer:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _note_activity(self):
+        # Cheap enough for every bus event, the idle timer reads it when due
+        self._last_activity = time.monotonic()
 
     def check_for_idle(self):
+        """ Idle timer, the check itself runs on the animator thread """
+        self.animator.submit(self._check_for_idle)
+
+    def _check_for_idle(self):
+        self._idle_timer = None
         if not self.settings['auto_dim_eyes']:
-            self.cancel_scheduled_event('IdleCheck')
             return
 
-        if self.enclosure.display_manager.get_active() in ['', Mark1]:
+        now = time.monotonic()
+        if self.enclosure.display_manager.get_active() not in ['', Mark1]:
+            self._last_activity = now
+        idle = now - self._last_activity
+
+        if idle < Mark1.IDLE_LOWER_DELAY:
+            # Something happened, stay awake
+            self.idle_count = 0
+            deadline = self._last_activity + Mark1.IDLE_LOWER_DELAY
+        elif self.idle_count < 2:
             # No activity, start to fall asleep
-            self.idle_count += 1
-
-            if self.idle_count == 2:
-                # Go into a 'sleep' visual state
-                self.enclosure.eyes_look('d')
-
-                # Lower the eyes
-                time.sleep(0.5)  # prevent overwriting of eye down animation
-                rgb = self._current_color
-                self.enclosure.eyes_setpixel(3, r=rgb[0], g=rgb[1], b=rgb[2])
-                self.enclosure.eyes_setpixel(8, r=rgb[0], g=rgb[1], b=rgb[2])
-                self.enclosure.eyes_setpixel(15, r=rgb[0], g=rgb[1], b=rgb[2])
-                self.enclosure.eyes_setpixel(20, r=rgb[0], g=rgb[1], b=rgb[2])
-            elif self.idle_count > 2:
-                self.cancel_scheduled_event('IdleCheck')
-
-                # Go into an 'inattentive' visual state
-                rgb = self._darker_color(self._current_color)
-                for idx in range(0, 3):
-                    self.enclosure.eyes_setpixel(idx, r=0, g=0, b=0)
-                    time.sleep(0.05)  # hack to prevent serial port overflow
-                for idx in range(3, 9):
-                    self.enclosure.eyes_setpixel(idx,
-                                                 r=rgb[0], g=rgb[1], b=rgb[2])
-                    time.sleep(0.05)  # hack to prevent serial port overflow
-                for idx in range(9, 15):
-                    self.enclosure.eyes_setpixel(idx, r=0, g=0, b=0)
-                    time.sleep(0.05)  # hack to prevent serial port overflow
-                for idx in range(15, 21):
-                    self.enclosure.eyes_setpixel(idx,
-                                                 r=rgb[0], g=rgb[1], b=rgb[2])
-                    time.sleep(0.05)  # hack to prevent serial port overflow
-                for idx in range(21, 24):
-                    self.enclosure.eyes_setpixel(idx, r=0, g=0, b=0)
-                    time.sleep(0.05)  # hack to prevent serial port overflow
+            self.idle_count = 2
+
+            # Go into a 'sleep' visual state
+            self.metrics.count('idle.lowered')
+            self._apply_face(self._lowered_visual(), IDLE)
+            deadline = max(self._last_activity + Mark1.IDLE_DIM_DELAY,
+                           now + Mark1.IDLE_DIM_DELAY -
+                           Mark1.IDLE_LOWER_DELAY)
         else:
-            self.idle_count = 0
-
-    def _darker_color(self, rgb):
-        r, g, b = rgb
-        darker_r = int(r) // 2
-        darker_g = int(g) // 2
-        darker_b = int(b) // 2
-
-        return darker_r, darker_g, darker_b
+            self.idle_count = 3
+
+            # Go into an 'inattentive' visual state
+            self.metrics.count('idle.inattentive')
+            self._apply_face(self._inattentive_visual(), IDLE)
+            return  # nothing more to do until woken up
+
+        self._idle_timer = self.timers.schedule(max(0, deadline - now),
+                                                self.check_for_idle)
+
+    def _lowered_visual(self):
+        # Look down, then light only the pixels the animation left dark,
+        # whatever the others are believed to show
+        look = Timeline().command('eyes_look', 'd', hold=0.5,
+                                  forget=Mark1.LOWERED_PIXELS)
+        pixels = [None] * EYE_PIXELS
+        for idx in Mark1.LOWERED_PIXELS:
+            pixels[idx] = self._current_color
+        return FaceState(pixels=pixels, before=look)
+
+    def _inattentive_visual(self):
+        pixels = [(0, 0, 0)] * EYE_PIXELS
+        for idx in Mark1.INATTENTIVE_PIXELS:
+            pixels[idx] = self._current_color
+        return FaceState(
+            pixels=self.led.dim_frame(pixels, Mark1.INATTENTIVE_DIM))
+
+    def _wake_visual(self):
+        return FaceState(pixels=[self._current_color] * EYE_PIXELS,
+                         before=Timeline().command('eyes_blink', 'b'))
 
     def handle_listener_started(self, message):
+        self._note_activity()
+        self.animator.submit(self._wake)
+
+    def _wake(self):
         if not self.settings['auto_dim_eyes']:
-            self.cancel_scheduled_event('IdleCheck')
+            self._stop_idle_check()
             return
 
         # Check if in 'idle' state and visually come to attention
         if self.idle_count > 2:
-            # Perform 'waking' animation
-            self.enclosure.eyes_blink('b')
-            rgb = self._current_color
-            self.enclosure.eyes_color(rgb[0], rgb[1], rgb[2])
+            # Perform 'waking' animation, it preempts any idle visual
+            self.metrics.count('idle.woken')
+            self._apply_face(self._wake_visual(), LISTENING)
             # Begin checking for the idle state again
             self.idle_count = 0
             self.start_idle_check()
@@ -290,46 +576,98 @@ class Mark1(MycroftSkill):
     # Web settings
 
     def on_websettings_changed(self):
-        # Update eye color if necessary
-        _color = self.settings.get('eye color')
+        # This is called much more often than the settings actually change,
+        # the reconciler works out what did and debounces bursts of calls.
+        self.metrics.count('settings.callbacks')
+        self.reconciler.notify()
+
+    def _on_eye_color_setting(self, changed):
+        # Only a new web setting may override local eye color changes
+        _color = changed['eye color']
+        if _color and self._parse_to_rgb(_color):
+            self.set_eye_color(color=_color, speak=False)
 
-        # TODO: This is a bit of a hack.  The on_web_settings() is being called
-        # much more often than it should, not just when the setting actually
-        # has changed.  This was overriding local eye color changes constantly.
-        if self.settings['web eye color'] != _color:
-            if _color and self._parse_to_rgb(_color):
-                self.set_eye_color(color=_color, speak=False)
-            self.settings['web eye color'] = _color
+    def _on_auto_dim_setting(self, changed):
+        self.animator.submit(self._apply_auto_dim, changed['auto_dim_eyes'])
 
+    def _apply_auto_dim(self, enabled):
         # Update eye state if auto_dim_eyes changes...
-        if self.settings.get("auto_dim_eyes"):
+        if enabled:
             self.start_idle_check()
         else:
             # No longer dimming, show open eyes if closed...
-            self.cancel_scheduled_event('IdleCheck')
+            self._stop_idle_check()
             if self.idle_count > 2:
                 self.idle_count = 0
-                rgb = self._current_color
-                self.enclosure.eyes_color(rgb[0], rgb[1], rgb[2])
+                self._apply_face(FaceState(color=self._current_color), USER)
+
+    def _on_led_gamma_setting(self, changed):
+        gamma = parse_gamma(self.settings.get('led_gamma'))
+        if gamma != self.led.gamma:
+            self.animator.submit(self._apply_led_gamma, gamma)
+
+    def _apply_led_gamma(self, gamma):
+        # On the animator thread, the dimmed eyes are redrawn
+        self.led = LedCurve(gamma)
+        if self.idle_count == 3:
+            self._apply_face(self._inattentive_visual(), IDLE)
+
+    def _on_auto_brightness_setting(self, changed):
+        if 'auto_brightness' in changed:
+            if changed['auto_brightness'] is True:
+                self.handle_auto_brightness(None)
+                return
+            self.auto_brightness = False
+        # Stops, or picks up the new range of, the brightness curve
+        self._update_auto_brightness()
 
-        # Update use of wake-up beep
-        self._sync_wake_beep_setting()
+    def _sync_wake_beep_setting(self, changed=None):
+        use_beep = self.settings.get("use_listening_beep") is True
+        # Compare with the configuration in effect, it may have been
+        # changed elsewhere, or with what is about to be written
+        current = self.config_writer.pending().get(
+            'confirm_listening',
+            Configuration.get().get('confirm_listening'))
+        if use_beep == current:
+            return  # already applied
+
+        # Update local (user) configuration setting, in the background
+        self.config_writer.update({'confirm_listening': use_beep})
+
+    def _save_settings(self, changes):
+        """ Change settings now, save them once changes stop
+
+        The new values are used right away.  Writing them out is left to
+        the settings writer, which merges a burst of changes, like trying
+        several colors in a row, into one write from the timer thread.
+        """
+        changes = {key: value for key, value in changes.items()
+                   if key not in self.settings or
+                   self.settings[key] != value}
+        if changes:
+            self.settings.update(changes)
+            self.settings_writer.update(changes)
+
+    def _store_settings(self, changes):
+        store = getattr(self.settings, 'store', None)
+        if store:
+            store()  # SkillSettings of older cores save themselves
+        else:
+            save_settings(self.root_dir, self.settings)
 
-    def _sync_wake_beep_setting(self):
-        from mycroft.configuration.config import (
-            LocalConf, USER_CONFIG, Configuration
-        )
+    def _store_user_config(self, changes):
+        """ Write changes to the user configuration, if they change it """
         config = Configuration.get()
-        use_beep = self.settings.get("use_listening_beep") is True
-        if not config['confirm_listening'] == use_beep:
-            # Update local (user) configuration setting
-            new_config = {
-                'confirm_listening': use_beep
-            }
-            user_config = LocalConf(USER_CONFIG)
-            user_config.merge(new_config)
-            user_config.store()
-            self.bus.emit(Message('configuration.updated'))
+        changes = {key: value for key, value in changes.items()
+                   if config.get(key) != value}
+        if not changes:
+            return  # e.g. toggled and back again before the write
+
+        user_config = LocalConf(USER_CONFIG)
+        user_config.merge(changes)
+        user_config.store()
+        # Makes every service reload its configuration, so only once
+        self.bus.emit(Message('configuration.updated'))
 
     #####################################################################
     # Color interactions
@@ -350,55 +688,69 @@ class Mark1(MycroftSkill):
             return  # no color provided!
 
         try:
-            self.enclosure.eyes_color(r, g, b)
-            self.idle_count = 0  # changing the color resets eyes to open
-            self._current_color = (r, g, b)
+            rgb = (int(r), int(g), int(b))
+            self.animator.submit(self._show_color, rgb)
             if speak and not initing:
-                self.speak_dialog('set.color.success')
+                named = isinstance(color, str) and color.lower()
+                if named and named in self.colors.rgb:
+                    self.speak_dialog('set.color.success')
+                else:
+                    # Set by hex code or values, say what it looks like
+                    self.speak_dialog(
+                        'set.color.nearest',
+                        data={'color': self.colors.nearest(rgb)})
 
             # Update saved color if necessary
             _color = self._parse_to_rgb(self.settings.get('current_eye_color'))
-            if self._current_color != _color:
-                if color is not None:
-                    self.settings['current_eye_color'] = color
-                else:
-                    self.settings['current_eye_color'] = [r, g, b]
+            if rgb != _color:
+                saved = color if color is not None else [r, g, b]
+                self._save_settings({'current_eye_color': saved})
         except Exception:
             self.log.debug('Bad color code: '+str(color))
             if speak and not initing:
                 self.speak_dialog('error.set.color')
             if initing:
-                self.enclosure.eyes_color(34, 167, 240)  # mycroft blue
+                self.animator.submit(self._show_color, (34, 167, 240))
+
+    def _show_color(self, rgb):
+        # On the animator thread, which owns the current color
+        self.idle_count = 0  # changing the color resets eyes to open
+        # The new color replaces queued idle visuals
+        self._apply_face(FaceState(color=rgb), USER)
 
     @intent_handler('custom.eye.color.intent')
     def handle_custom_eye_color(self, message):
-        # Conversational interaction to set a custom eye color
+        # Set a custom eye color, e.g. "red 10 green 200 blue 30", a hex
+        # code or "darker teal".  Only what wasn't said is asked for.
+        parser = self.color_parser
+        custom = parser.parse(message.data.get('utterance'))
+        rgb = list(custom.rgb)
+        if rgb == [None, None, None]:
+            self.speak_dialog('set.custom.color')
+            wait_while_speaking()
 
         def is_byte(utt):
-            try:
-                return 0 <= int(utt) <= 255
-            except Exception:
-                return False
-
-        self.speak_dialog('set.custom.color')
-        wait_while_speaking()
-        r = self.get_response('get.r.value', validator=is_byte,
-                              on_fail="error.rgbvalue", num_retries=2)
-        if not r:
-            return  # cancelled
-
-        g = self.get_response('get.g.value', validator=is_byte,
-                              on_fail="error.rgbvalue", num_retries=2)
-        if not g:
-            return  # cancelled
-
-        b = self.get_response('get.b.value', validator=is_byte,
-                              on_fail="error.rgbvalue", num_retries=2)
-        if not b:
-            return  # cancelled
-
-        custom_rgb = [r, g, b]
-        self.set_eye_color(rgb=custom_rgb)
+            return parser.byte(utt) is not None
+
+        for idx, dialog in enumerate(('get.r.value', 'get.g.value',
+                                      'get.b.value')):
+            if rgb[idx] is None:
+                value = self.get_response(dialog, validator=is_byte,
+                                          on_fail="error.rgbvalue",
+                                          num_retries=2)
+                if not value:
+                    return  # cancelled
+                rgb[idx] = parser.byte(value)
+
+        self.set_eye_color(rgb=self._shade(rgb, custom.shade))
+
+    def _shade(self, rgb, shade):
+        """ rgb, darker (shade -1) or lighter (shade 1) """
+        if shade < 0:
+            return self.led.dim(rgb, Mark1.SHADE_DIM)
+        if shade > 0:
+            return lighten(rgb, Mark1.SHADE_LIGHTEN)
+        return tuple(rgb)
 
     @intent_handler('eye.color.intent')
     def handle_eye_color(self, message):
@@ -411,12 +763,26 @@ class Mark1(MycroftSkill):
                      self.get_response('color.need'))
         if color_str:
             # TODO:18.02: normalize() should automatically get current lang
-            match = fuzzy_match_color(normalize(color_str), self.color_dict)
-            if match is not None:
+            color_str = normalize(color_str)
+            match = self.color_index.match(color_str)
+            custom = self.color_parser.parse(color_str)
+            if None not in custom.rgb and (
+                    match is None or custom.kind != 'color' or
+                    self._explicit_shade(custom, match)):
+                # A shade, hex code or values rather than a color name
+                self.set_eye_color(rgb=self._shade(custom.rgb,
+                                                   custom.shade))
+            elif match is not None:
                 self.set_eye_color(color=match)
             else:
                 self.speak_dialog('color.not.exist')
 
+    def _explicit_shade(self, custom, match):
+        # "darker teal" is a shade, "dark see green" dark sea green
+        if not custom.shade:
+            return False
+        return ' {} '.format(custom.shade_word) not in ' {} '.format(match)
+
     def _parse_to_rgb(self, color):
         """ Convert color descriptor to RGB
 
@@ -428,28 +794,7 @@ class Mark1(MycroftSkill):
         Returns:
             (r, g, b) (tuple): Tuple of rgb values (0-255) or None
         """
-        if not color:
-            return None
-
-        # check if named color in dict
-        try:
-            if color.lower() in self.color_dict:
-                return _hex_to_rgb(self.color_dict[color.lower()])
-        except Exception:
-            pass
-
-        # check if rgb tuple like '(0,0,128)'
-        try:
-            (r, g, b) = parse_tuple(color)
-            if 0 <= r <= 255 and 0 <= g <= 255 and 0 <= b <= 255:
-                return (r, g, b)
-            else:
-                return None
-        except Exception:
-            pass
-
-        # Finally check if color is hex, like '#0000cc' or '0000cc'
-        return _hex_to_rgb(color)
+        return self.colors.parse(color)
 
     #####################################################################
     # Brightness intent interaction
@@ -470,61 +815,45 @@ class Mark1(MycroftSkill):
         """ parse text for brightness percentage
 
             Args:
-                brightness (str): string containing brightness level
+                brightness (str): string containing brightness level, or
+                                  a change like "a bit brighter"
 
             return:
-                (int): brightness as percentage (0-100)
+                (int): brightness as percentage (0-100), -1 for automatic
         """
+        return self.brightness_parser.parse(brightness,
+                                            self._brightness_level).percent
 
-        try:
-            # Handle "full", etc.
-            name = normalize(brightness)
-            if name in self.brightness_dict:
-                return self.brightness_dict[name]
-
-            if '%' in brightness:
-                brightness = brightness.replace("%", "").strip()
-                return int(brightness)
-            if 'percent' in brightness:
-                brightness = brightness.replace("percent", "").strip()
-                return int(brightness)
-
-            i = int(brightness)
-            if i < 0 or i > 100:
-                return None
-
-            if i < 30:
-                # Assmume plain 0-30 is "level"
-                return int((i*100.0)/30.0)
-
-            # Assume plain 31-100 is "percentage"
-            return i
-        except Exception:
-            return None  # failed in an int() conversion
-
-    def set_eye_brightness(self, level, speak=True):
+    def set_eye_brightness(self, level, speak=True, percent=None):
         """ Actually change hardware eye brightness
 
             Args:
                 level (int): 0-30, brightness level
                 speak (bool): when True, speak a confirmation
+                percent (int): brightness asked for, spoken instead of
+                               the percentage of the level
         """
-        self.enclosure.eyes_brightness(level)
+        self.apply_face(FaceState(brightness=level))
+        self._brightness_level = level
         if speak is True:
-            percent = int(float(level)*float(100)/float(30))
+            if percent is None:
+                percent = int(float(level)*float(100)/float(30))
             self.speak_dialog(
                 'brightness.set', data={'val': str(percent)+'%'})
 
     def _set_brightness(self, brightness):
-        # brightness can be a number or word like "full", "half"
+        # brightness can be a number, a word like "full", "half" or a
+        # change like "dim by 20 percent"
         percent = self.parse_brightness(brightness)
         if percent is None:
             self.speak_dialog('brightness.not.found.final')
-        elif int(percent) is -1:
+        elif percent == -1:
             self.handle_auto_brightness(None)
         else:
             self.auto_brightness = False
-            self.set_eye_brightness(self.percent_to_level(percent))
+            self._update_auto_brightness()  # stops following the curve
+            self.set_eye_brightness(self.percent_to_level(percent),
+                                    percent=percent)
 
     @intent_handler('brightness.intent')
     def handle_brightness(self, message):
@@ -533,70 +862,36 @@ class Mark1(MycroftSkill):
             Args:
                 message (dict): messagebus message from intent parser
         """
-        brightness = (message.data.get('brightness', None) or
+        brightness = message.data.get('brightness', None)
+        if not brightness:
+            # Matched without a value, e.g. "brighten it up a bit"
+            utterance = message.data.get('utterance', '')
+            if self.parse_brightness(utterance) is not None:
+                brightness = utterance
+        brightness = (brightness or
                       self.get_response('brightness.not.found'))
         if brightness:
             self._set_brightness(brightness)
 
-    def _get_auto_time(self):
-        """ get dawn, sunrise, noon, sunset, and dusk time
-
-            returns:
-                times (dict): dict with associated (datetime, level)
-        """
-        tz = self.location['timezone']['code']
-        lat = self.location['coordinate']['latitude']
-        lon = self.location['coordinate']['longitude']
-        ast_loc = astral.Location()
-        ast_loc.timezone = tz
-        ast_loc.lattitude = lat
-        ast_loc.longitude = lon
-
-        user_set_tz = \
-            timezone(tz).localize(datetime.now()).strftime('%Z')
-        device_tz = time.tzname
-
-        if user_set_tz in device_tz:
-            sunrise = ast_loc.sun()['sunrise']
-            noon = ast_loc.sun()['noon']
-            sunset = ast_loc.sun()['sunset']
-        else:
-            secs = int(self.location['timezone']['offset']) / -1000
-            sunrise = arrow.get(
-                ast_loc.sun()['sunrise']).shift(
-                    seconds=secs).replace(tzinfo='UTC').datetime
-            noon = arrow.get(
-                ast_loc.sun()['noon']).shift(
-                    seconds=secs).replace(tzinfo='UTC').datetime
-            sunset = arrow.get(
-                ast_loc.sun()['sunset']).shift(
-                    seconds=secs).replace(tzinfo='UTC').datetime
-
-        return {
-            'Sunrise': (sunrise, 20),  # high
-            'Noon': (noon, 30),        # full
-            'Sunset': (sunset, 5)      # dim
-        }
-
-    def schedule_brightness(self, time_of_day, pair):
-        """ schedule auto brightness with the event scheduler
-
-            Args:
-                time_of_day (str): Sunrise, Noon, Sunset
-                pair (tuple): (datetime, brightness)
-        """
-        d_time = pair[0]
-        brightness = pair[1]
-        now = arrow.now()
-        arw_d_time = arrow.get(d_time)
-        data = (time_of_day, brightness)
-        if now.timestamp > arw_d_time.timestamp:
-            d_time = arrow.get(d_time).shift(hours=+24)
-            self.schedule_event(self._handle_eye_brightness_event, d_time,
-                                data=data, name=time_of_day)
-        else:
-            self.schedule_event(self._handle_eye_brightness_event, d_time,
-                                data=data, name=time_of_day)
+    def _auto_brightness_range(self):
+        """ (minimum, maximum) auto brightness levels from the settings """
+        levels = []
+        for key, default in (('auto_brightness_min', 20),
+                             ('auto_brightness_max', 100)):
+            try:
+                percent = min(100, max(0, float(self.settings.get(key))))
+            except (TypeError, ValueError):
+                percent = default
+            levels.append(self.percent_to_level(percent))
+        return tuple(levels)
+
+    def _brightness_curve(self):
+        """ Auto brightness curve around today, from the cached sun times """
+        today = date.today()
+        days = [self.solar.get(self.location, today + timedelta(days=i))
+                for i in (-1, 0, 1)]
+        minimum, maximum = self._auto_brightness_range()
+        return BrightnessCurve(days, minimum, maximum)
 
     # TODO: this is currently set by voice.
     # allow setting from faceplate and web ui
@@ -608,41 +903,179 @@ class Mark1(MycroftSkill):
                 message (dict): messagebus message from intent parser
         """
         self.auto_brightness = True
-        auto_time = self._get_auto_time()
-        nearest_time_to_now = (float('inf'), None, None)
-        for time_of_day, pair in auto_time.items():
-            self.schedule_brightness(time_of_day, pair)
-            now = arrow.now().timestamp
-            t = arrow.get(pair[0]).timestamp
-            if abs(now - t) < nearest_time_to_now[0]:
-                nearest_time_to_now = (abs(now - t), pair[1], time_of_day)
-        self.set_eye_brightness(nearest_time_to_now[1], speak=False)
-
-        # SSP: I'm disabling this for now.  I don't think we
-        # should announce this every day, it'll get tedious.
-        #
-        # tod = nearest_time_to_now[2]
-        # if tod == 'Sunrise':
-        #     self.speak_dialog('auto.sunrise')
-        # elif tod == 'Sunset':
-        #     self.speak_dialog('auto.sunset')
-        # elif tod == 'Noon':
-        #     self.speak_dialog('auto.noon')
-
-    def _handle_eye_brightness_event(self, message):
-        """ wrapper for setting eye brightness from
-            eventscheduler
+        # Work out the coming days while nothing else is going on
+        self.background.schedule(0, self.solar.prefetch, self.location)
+        self._update_auto_brightness()
 
-            Args:
-                message (dict): messagebus message
+    def _update_auto_brightness(self):
+        """ Follow the auto brightness curve
+
+        Writes to the faceplate only when the level changes and re-arms
+        itself for the next change, so auto brightness is a single timer.
         """
-        if self.auto_brightness is True:
-            time_of_day = message.data[0]
-            level = message.data[1]
-            self.cancel_scheduled_event(time_of_day)
+        if self._auto_brightness_timer:
+            self._auto_brightness_timer.cancel()
+            self._auto_brightness_timer = None
+        if not self.auto_brightness:
+            return
+
+        curve = self._brightness_curve()
+        now = time.time()
+        level = curve.level(now)
+        if level != self._brightness_level:
             self.set_eye_brightness(level, speak=False)
-            pair = self._get_auto_time()[time_of_day]
-            self.schedule_brightness(time_of_day, pair)
+
+        # Wake up again for the next level, but never sleep so long that
+        # a clock change (e.g. NTP sync after boot) goes unnoticed.
+        next_change = curve.next_change(now)
+        delay = Mark1.AUTO_BRIGHTNESS_MAX_WAIT
+        if next_change is not None:
+            delay = min(delay, next_change - now + 1)
+        self._auto_brightness_timer = self.timers.schedule(
+            delay, self._update_auto_brightness)
+
+    #####################################################################
+    # Face state
+
+    def apply_face(self, state, priority=USER, done=None):
+        """ Move the face to a new state, the path all face output takes
+
+        Args:
+            state (FaceState): what the face should look like
+            priority (int): IDLE, USER or LISTENING
+            done (callable): called with True once applied, False if
+                             replaced by something of higher priority
+        """
+        self.animator.submit(self._apply_face, state, priority, done)
+
+    def _apply_face(self, state, priority=USER, done=None):
+        # On the animator thread, which owns the current color
+        if state.frame() is not None or state.before is not None:
+            def played(applied):
+                # The color is only current once the eyes show it
+                if applied and state.color is not None:
+                    self._current_color = state.color
+                if done:
+                    done(applied)
+
+            self.animator.play(state.timeline(), priority, done=played)
+            return
+        # Brightness alone replaces nothing, it is never dropped
+        if state.brightness is not None:
+            self.eyes.brightness(state.brightness)
+        if done:
+            done(True)
+
+    def handle_face_apply(self, message):
+        """ Apply a whole face state asked for on mark1.face.apply
+
+        The message may hold
+            color: name, hex code, '(r, g, b)' or [r, g, b]
+            brightness: 0-100, how bright the eyes look
+            pixels: 24 [r, g, b] or null, drawn over the color
+            transition: seconds to move to the new frame, at most 10
+        and is answered on mark1.face.apply.response with 'applied' true
+        once the face shows it, or false with an 'error' when the state
+        isn't valid or false when something more important took over.
+        """
+        try:
+            state = self._face_state(message.data)
+        except (TypeError, ValueError) as e:
+            self.bus.emit(message.reply('mark1.face.apply.response',
+                                        {'applied': False,
+                                         'error': str(e)}))
+            return
+
+        def done(applied):
+            if applied and state.brightness is not None:
+                self._brightness_level = state.brightness
+            self.bus.emit(message.reply('mark1.face.apply.response',
+                                        {'applied': applied}))
+
+        self._note_activity()
+        self.apply_face(state, USER, done)
+
+    def _face_state(self, data):
+        """ FaceState from the data of a mark1.face.apply message """
+        def number(value, what):
+            value = float(value)
+            if not math.isfinite(value):
+                raise ValueError('bad {}: {!r}'.format(what, value))
+            return value
+
+        def rgb_of(value, what):
+            if isinstance(value, (list, tuple)):
+                rgb = tuple(int(c) for c in value)
+                if len(rgb) == 3 and all(0 <= c <= 255 for c in rgb):
+                    return rgb
+            elif isinstance(value, str):
+                rgb = self.colors.parse(value)
+                if rgb is not None:
+                    return rgb
+            raise ValueError('bad {}: {!r}'.format(what, value))
+
+        color = data.get('color')
+        if color is not None:
+            color = rgb_of(color, 'color')
+        brightness = data.get('brightness')
+        if brightness is not None:
+            brightness = self.percent_to_level(
+                min(100, max(0, number(brightness, 'brightness'))))
+        pixels = data.get('pixels')
+        if pixels is not None:
+            if len(pixels) != EYE_PIXELS:
+                raise ValueError('pixels needs {} entries'.format(
+                    EYE_PIXELS))
+            pixels = [None if rgb is None else rgb_of(rgb, 'pixel')
+                      for rgb in pixels]
+        transition = min(Mark1.FACE_MAX_TRANSITION, max(
+            0.0, number(data.get('transition') or 0, 'transition')))
+        return FaceState(color, brightness, pixels, transition)
+
+    #####################################################################
+    # Runtime metrics
+
+    def _register_gauges(self):
+        # Counters other objects keep anyway, read when a snapshot is taken
+        gauges = {
+            'eyes.dropped_writes': lambda: self.eyes.dropped,
+            'animator.played': lambda: self.animator.played,
+            'animator.skipped_frames': lambda: self.animator.skipped,
+            'animator.preempted': lambda: self.animator.preempted,
+            'timers.pending': lambda: len(self.timers),
+            'settings.passes': lambda: self.reconciler.passes,
+            'settings.noops': lambda: self.reconciler.noops,
+            'config.writes': lambda: self.config_writer.writes,
+            'settings.writes': lambda: self.settings_writer.writes,
+            'busy.handlers': lambda: self.hourglass_info.stats(),
+            'busy.learned': lambda: len(self.handler_times),
+            'solar.computations': lambda: self.solar.computations,
+            'idle.count': lambda: self.idle_count
+        }
+        for name, func in gauges.items():
+            self.metrics.gauge(name, func)
+
+    def handle_metrics_get(self, message):
+        """ Answer mark1.metrics.get with a snapshot of the metrics """
+        self.bus.emit(message.reply('mark1.metrics.get.response',
+                                    self.metrics.snapshot()))
+
+    def _schedule_metrics_log(self, changed=None):
+        if self._metrics_log_timer:
+            self._metrics_log_timer.cancel()
+            self._metrics_log_timer = None
+        try:
+            interval = float(self.settings.get('metrics_log_interval',
+                                               Mark1.METRICS_LOG_INTERVAL))
+        except (TypeError, ValueError):
+            interval = 0
+        if interval > 0:
+            self._metrics_log_timer = self.timers.schedule(
+                interval * 60, self._log_metrics)
+
+    def _log_metrics(self):
+        self.log.info('Metrics: ' + self.metrics.summary())
+        self._schedule_metrics_log()
 
 
 def create_skill():
@@ -0,0 +1,433 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import logging
+import time
+from collections import deque
+from itertools import count
+from threading import Condition, Event, Thread
+
+from .eyes import EYE_PIXELS, pack_rgb
+
+
+def linear(t):
+    return t
+
+
+def ease_in(t):
+    return t * t
+
+
+def ease_out(t):
+    return t * (2 - t)
+
+
+def ease_in_out(t):
+    return t * t * (3 - 2 * t)
+
+
+def _blend(start, end, t):
+    """ Packed color part way (0.0-1.0) from start to end """
+    if start is None or t >= 1:
+        return end
+    out = 0
+    for shift in (16, 8, 0):
+        a = (start >> shift) & 0xFF
+        b = (end >> shift) & 0xFF
+        out |= int(a + (b - a) * t + 0.5) << shift
+    return out
+
+
+class Timeline(object):
+    """ Declarative description of an eye animation
+
+    A timeline is a list of steps.  Frame steps move the eyes to a new
+    24 pixel frame, either at once or over a duration with easing.
+    Command steps run one of the animations built into the faceplate,
+    like eyes_blink, and hold for as long as it takes.  Brightness steps
+    set the eye brightness.
+
+        Timeline().command('eyes_look', 'd', hold=0.5).solid(rgb)
+    """
+    def __init__(self):
+        self.steps = []
+
+    def command(self, name, *args, hold=0, forget=()):
+        """ Run an enclosure command
+
+        Args:
+            name (str): EnclosureAPI method, e.g. 'eyes_blink'
+            hold (float): seconds the faceplate is busy with it
+            forget (list): pixels left in an unknown state afterwards
+        """
+        self.steps.append(('command', (name, args, tuple(forget)), hold))
+        return self
+
+    def reset(self, command='reset', hold=0):
+        """ Reset the faceplate, see EyeFramebuffer.reset()
+
+        Args:
+            command (str): 'reset' or 'mouth_reset'
+            hold (float): seconds the faceplate is busy with it
+        """
+        self.steps.append(('reset', command, hold))
+        return self
+
+    def brightness(self, level):
+        """ Set the eye brightness (0-30) """
+        self.steps.append(('brightness', int(level), 0))
+        return self
+
+    def frame(self, pixels, duration=0, easing=linear):
+        """ Move to a frame
+
+        Args:
+            pixels (list): 24 (r, g, b) tuples, None leaves a pixel as is
+            duration (float): seconds of the transition
+            easing (callable): maps elapsed fraction to progress (0-1)
+        """
+        packed = [None if rgb is None else pack_rgb(*rgb) for rgb in pixels]
+        self.steps.append(('frame', (packed, easing), duration))
+        return self
+
+    def solid(self, rgb, duration=0, easing=linear):
+        """ Move to a frame with every pixel the same color """
+        return self.frame([rgb] * EYE_PIXELS, duration, easing)
+
+    def duration(self):
+        """ Seconds the whole timeline takes """
+        return sum(step[2] for step in self.steps)
+
+    def compile(self, start, fps):
+        """ Expand the timeline to timed frames and commands
+
+        Transitions are sampled at fps, and samples identical to the
+        previous frame are dropped.
+
+        Args:
+            start (list): packed colors currently shown, None if unknown
+            fps (float): maximum frame rate
+        Returns:
+            list: (offset, kind, payload, final) tuples, offset in
+                  seconds from the start of the animation
+        """
+        program = []
+        now = 0.0
+        current = list(start)
+        for kind, payload, duration in self.steps:
+            if kind == 'command':
+                program.append((now, kind, payload, True))
+                now += duration
+                for idx in payload[2]:
+                    current[idx] = None
+                continue
+            if kind == 'reset':
+                program.append((now, kind, payload, True))
+                now += duration
+                current = [None] * EYE_PIXELS
+                continue
+            if kind == 'brightness':
+                program.append((now, kind, payload, True))
+                continue
+
+            pixels, easing = payload
+            target = [current[i] if p is None else p
+                      for i, p in enumerate(pixels)]
+            ticks = max(1, int(duration * fps))
+            origin = current
+            for tick in range(1, ticks + 1):
+                progress = easing(float(tick) / ticks)
+                frame = [_blend(a, b, progress)
+                         for a, b in zip(origin, target)]
+                offset = now + duration * tick / ticks
+                if frame != current:
+                    program.append((offset, kind, frame, tick == ticks))
+                    current = frame
+            now += duration
+        return program
+
+
+class FaceState(object):
+    """ Complete target state of the face, applied in one go
+
+    The eyes move to the frame of color and pixels, and then to the
+    brightness, as a single timeline, so nothing of lower priority gets
+    in between and a state that is preempted doesn't leave its
+    brightness behind.  The framebuffer turns that into the fewest
+    commands.
+
+    Args:
+        color (tuple): (r, g, b) new eye color, None keeps the current
+        brightness (int): faceplate level (0-30), None keeps the current
+        pixels (list): 24 (r, g, b) tuples drawn over the color, None
+                       where the color (or, without one, the current
+                       pixel) shows
+        transition (float): seconds to move to the new frame
+        before (Timeline): faceplate animation played first, like a blink
+    """
+    def __init__(self, color=None, brightness=None, pixels=None,
+                 transition=0, before=None):
+        self.color = color
+        self.brightness = brightness
+        self.pixels = pixels
+        self.transition = transition
+        self.before = before
+
+    def frame(self):
+        """ The 24 pixels to show, None where unchanged or if nothing """
+        if self.pixels is None:
+            return None if self.color is None else [self.color] * EYE_PIXELS
+        return [self.color if rgb is None else rgb for rgb in self.pixels]
+
+    def timeline(self):
+        """ Timeline moving the eyes to this state """
+        timeline = Timeline()
+        if self.before is not None:
+            timeline.steps.extend(self.before.steps)
+        frame = self.frame()
+        if frame is not None:
+            timeline.frame(frame, self.transition, ease_in_out)
+        if self.brightness is not None:
+            timeline.brightness(self.brightness)
+        return timeline
+
+
+# Priorities of face output, a visual preempts lower priority ones
+IDLE = 0       # dimming when nobody is around
+USER = 1       # color changes, resets and the hourglass of a slow handler
+LISTENING = 2  # waking up for the wake word
+
+
+def apply_step(framebuffer, kind, payload):
+    """ Send one compiled timeline step to the framebuffer """
+    if kind == 'command':
+        name, args, forget = payload
+        framebuffer.command(name, args, forget)
+    elif kind == 'reset':
+        framebuffer.reset(payload)
+    elif kind == 'brightness':
+        framebuffer.brightness(payload)
+    else:
+        framebuffer.frame = payload
+        framebuffer.flush()
+
+
+class Animator(object):
+    """ The single consumer of all face output
+
+    Timelines are played from a dedicated worker thread in priority
+    order.  A timeline preempts a playing one of lower priority and drops
+    queued ones of lower priority, so waking up never waits behind idle
+    dimming.  Timelines of the same priority play in order.
+
+    The worker also runs tasks given to submit(), in order and between
+    animation steps, so the state they touch is only ever changed from
+    this one thread.
+
+    Whoever needs to know when a timeline is done passes a done
+    callback, called from the worker with True once the timeline has
+    played and with False if it was dropped or preempted.
+
+    Frames are pushed through the EyeFramebuffer, so only changed pixels
+    are written and the serial link is paced by its governor.  When the
+    link can't keep up with the frame rate, intermediate frames of a
+    transition are skipped rather than queued up.
+
+    Args:
+        framebuffer (EyeFramebuffer): eyes to draw on
+        fps (float): maximum frame rate
+        log (Logger): where failing animations are reported
+    """
+    MAX_FPS = 10  # a full frame of setpixels takes ~0.7s at 9600 baud
+
+    def __init__(self, framebuffer, fps=MAX_FPS, log=None,
+                 clock=time.monotonic):
+        self.framebuffer = framebuffer
+        self.fps = fps
+        self.log = log or logging.getLogger(__name__)
+        self.clock = clock
+        self._queue = []  # heap of (-priority, sequence, timeline, done)
+        self._seq = count()
+        self._tasks = deque()
+        self._wakeup = Condition()
+        self._interrupt = Event()
+        self._playing = None  # priority of the playing timeline
+        self._in_task = False
+        self._running = True
+        self.played = 0
+        self.preempted = 0
+        self.skipped = 0  # frames dropped because the link was too slow
+        self._thread = Thread(target=self._run, name='Mark1Animator')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def play(self, timeline, priority=IDLE, interrupt=False, done=None):
+        """ Queue a timeline
+
+        Args:
+            timeline (Timeline): animation to play
+            priority (int): IDLE, USER or LISTENING
+            interrupt (bool): drop queued animations and stop the
+                              current one first, whatever their priority
+            done (callable): called with True once played, False if
+                             dropped or preempted
+        """
+        with self._wakeup:
+            dropped = []
+            if interrupt:
+                dropped, self._queue = self._queue, []
+            elif self._queue and -self._queue[0][0] < priority:
+                # Drop what this visual overrides anyway
+                dropped = [e for e in self._queue if -e[0] < priority]
+                self._queue = [e for e in self._queue if -e[0] >= priority]
+                heapq.heapify(self._queue)
+            if self._playing is not None and (interrupt or
+                                              self._playing < priority):
+                self.preempted += 1
+                self._interrupt.set()
+            heapq.heappush(self._queue, (-priority, next(self._seq),
+                                         timeline, done))
+            self._wakeup.notify_all()
+        self._dropped(dropped)
+
+    def _dropped(self, entries):
+        for entry in entries:
+            self._done(entry[3], False)
+
+    def _done(self, done, played):
+        if done is None:
+            return
+        try:
+            done(played)
+        except Exception:
+            self.log.exception('Animation callback failed')
+
+    def submit(self, func, *args):
+        """ Run func(*args) on the worker thread, never dropped """
+        with self._wakeup:
+            self._tasks.append((func, args))
+            self._wakeup.notify_all()
+
+    def cancel(self):
+        """ Stop the current animation and drop queued ones """
+        with self._wakeup:
+            dropped, self._queue = self._queue, []
+            self._interrupt.set()
+            self._wakeup.notify_all()
+        self._dropped(dropped)
+
+    def _idle(self):
+        return not (self._queue or self._tasks or self._in_task or
+                    self._playing is not None)
+
+    def wait(self, timeout=None):
+        """ Block until every queued task and animation is done
+
+        Returns:
+            (bool): False if the timeout ran out first
+        """
+        with self._wakeup:
+            return self._wakeup.wait_for(self._idle, timeout)
+
+    def stop(self):
+        with self._wakeup:
+            self._running = False
+            dropped, self._queue = self._queue, []
+            self._tasks.clear()
+            self._interrupt.set()
+            self._wakeup.notify_all()
+        self._thread.join(1.0)
+        self._dropped(dropped)
+
+    def _run_tasks(self):
+        while True:
+            with self._wakeup:
+                if not self._tasks or not self._running:
+                    self._in_task = False
+                    self._wakeup.notify_all()
+                    return
+                func, args = self._tasks.popleft()
+                self._in_task = True
+            try:
+                func(*args)
+            except Exception:
+                self.log.exception('Face task {} failed'.format(
+                    getattr(func, '__name__', func)))
+
+    def _run(self):
+        while True:
+            self._run_tasks()
+            with self._wakeup:
+                self._playing = None
+                self._wakeup.notify_all()
+                while self._running and not self._queue and \
+                        not self._tasks:
+                    self._wakeup.wait()
+                if not self._running:
+                    return
+                if self._tasks:
+                    continue
+                priority, _, timeline, done = heapq.heappop(self._queue)
+                self._interrupt.clear()
+                self._playing = -priority
+            played = False
+            try:
+                played = self._play(timeline)
+                self.played += 1
+            except Exception:
+                self.log.exception('Eye animation failed')
+            self._done(done, played)
+
+    def _sleep(self, seconds):
+        """ Wait, running submitted tasks meanwhile
+
+        Returns:
+            (bool): True if interrupted
+        """
+        deadline = self.clock() + seconds
+        while True:
+            self._run_tasks()
+            with self._wakeup:
+                if self._interrupt.is_set():
+                    return True
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    return False
+                if not self._tasks:
+                    self._wakeup.wait(remaining)
+
+    def _play(self, timeline):
+        """ Returns False if interrupted before the last step """
+        framebuffer = self.framebuffer
+        program = timeline.compile(framebuffer.current(), self.fps)
+        start = self.clock()
+        for i, (offset, kind, payload, final) in enumerate(program):
+            self._run_tasks()
+            if self._interrupt.is_set():
+                return False
+            elapsed = self.clock() - start
+            if (not final and i + 1 < len(program) and
+                    program[i + 1][0] <= elapsed):
+                self.skipped += 1
+                continue  # running late, skip to a later frame
+            if offset > elapsed and self._sleep(offset - elapsed):
+                return False
+            apply_step(framebuffer, kind, payload)
+
+        # Let the last step finish before the next timeline starts
+        remaining = timeline.duration() - (self.clock() - start)
+        if remaining > 0:
+            self._sleep(remaining)
+        return True
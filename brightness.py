@@ -0,0 +1,250 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+MAX_LEVEL = 30  # brightest level the faceplate accepts
+
+
+def quantize(value):
+    """ Round a brightness to the 0-30 level sent to the faceplate """
+    return max(0, min(MAX_LEVEL, int(value + 0.5)))
+
+
+class BrightnessCurve(object):
+    """ Auto brightness over the day, interpolated between solar keyframes
+
+    The eyes sit at the minimum through the night, start brightening a
+    little before sunrise, peak at solar noon and are back at the minimum
+    by sunset.
+
+    Args:
+        days (list): consecutive solar time dicts ('sunrise', 'noon' and
+                     'sunset' datetimes), e.g. for yesterday, today and
+                     tomorrow
+        minimum (float): night time level (0-30)
+        maximum (float): solar noon level (0-30)
+    """
+    DAWN = 30 * 60      # seconds of brightening before sunrise
+    SUNRISE = 0.6       # level at sunrise, as fraction of the range
+
+    def __init__(self, days, minimum=6, maximum=MAX_LEVEL):
+        self.minimum = float(minimum)
+        self.maximum = float(max(minimum, maximum))
+        span = self.maximum - self.minimum
+
+        keyframes = []
+        for times in days:
+            sunrise = times['sunrise'].timestamp()
+            keyframes += [
+                (sunrise - BrightnessCurve.DAWN, self.minimum),
+                (sunrise, self.minimum + span * BrightnessCurve.SUNRISE),
+                (times['noon'].timestamp(), self.maximum),
+                (times['sunset'].timestamp(), self.minimum)
+            ]
+        keyframes.sort()
+        self.times = [t for t, _ in keyframes]
+        self.levels = [level for _, level in keyframes]
+
+    def _segment(self, now):
+        i = bisect_right(self.times, now)
+        if i == 0 or i == len(self.times):
+            return None
+        return i - 1
+
+    def value(self, now):
+        """ Unquantized brightness at timestamp now """
+        i = self._segment(now)
+        if i is None:
+            return self.minimum
+        t0, t1 = self.times[i], self.times[i + 1]
+        l0, l1 = self.levels[i], self.levels[i + 1]
+        if t1 == t0:
+            return l1
+        return l0 + (l1 - l0) * (now - t0) / (t1 - t0)
+
+    def level(self, now):
+        """ Faceplate level (0-30) at timestamp now """
+        return quantize(self.value(now))
+
+    def next_change(self, now):
+        """ Timestamp when level() will next differ from level(now)
+
+        Returns:
+            (float): timestamp, or None past the last keyframe
+        """
+        i = self._segment(now)
+        if i is None:
+            return self.times[0] if now < self.times[0] else None
+        t0, t1 = self.times[i], self.times[i + 1]
+        l0, l1 = self.levels[i], self.levels[i + 1]
+        if l1 == l0:
+            return t1
+
+        # Level steps once the value crosses the next half level
+        current = quantize(self.value(now))
+        edge = current + 0.5 if l1 > l0 else current - 0.5
+        when = t0 + (edge - l0) * (t1 - t0) / (l1 - l0)
+        return min(max(when, now), t1)
+
+
+# Result of BrightnessParser.parse(); percent is the brightness asked for
+# (0-100, -1 for automatic) or None, current the level (0-30) it was
+# relative to and relative whether it was an adjustment.
+Brightness = namedtuple('Brightness', ['percent', 'current', 'relative'])
+
+
+def _linear_percent(level):
+    return level * 100.0 / MAX_LEVEL
+
+
+_TOKEN = re.compile(r'\d+|%|\w+')
+
+
+def tokenize(text):
+    return tuple(_TOKEN.findall(text.lower()))
+
+
+class BrightnessParser(object):
+    """ Understands how bright the eyes should be, in a single pass
+
+    Built once per language.  Text is split into tokens which are looked
+    up, longest phrase first, in one table of named levels, number words
+    and the words of brightness.words.value:
+
+        percent   the number is a percentage ("50 percent", "50%")
+        level     the number is a faceplate level (0-30)
+        by        the number is a change ("dim by 20 percent")
+        up, down  brighter or dimmer ("brighten it up", "too bright")
+        small     a small change ("a bit brighter")
+
+    A plain number below 30 is a level and 30-100 a percentage, as
+    before.  A direction without a "by" number is a step from the current
+    level; with a number that isn't a change, it is just wording ("turn
+    it up to 80").
+
+    Args:
+        levels (dict): named levels mapped to a percentage, -1 for auto
+        words (dict): word or phrase mapped to its meaning, see above
+        numbers (dict): number words mapped to their value
+    """
+    STEP = 20        # percent changed by "brighter"
+    SMALL_STEP = 10  # percent changed by "a bit brighter"
+
+    def __init__(self, levels, words=None, numbers=None):
+        self.levels = {tokenize(name): int(percent)
+                       for name, percent in levels.items()}
+        self.phrases = {}
+        for phrase, value in (numbers or {}).items():
+            self.phrases[tokenize(phrase)] = ('number', int(value))
+        for phrase, meaning in (words or {}).items():
+            self.phrases[tokenize(phrase)] = (meaning, None)
+        self.phrases[('%',)] = ('percent', None)
+        self.longest = max([len(p) for p in self.phrases] + [1])
+        self._interpret = lru_cache(maxsize=256)(self._interpret)
+
+    def _scan(self, tokens):
+        # Yields (meaning, number) for every known phrase, longest first
+        i, end = 0, len(tokens)
+        phrases = self.phrases
+        while i < end:
+            token = tokens[i]
+            if token.isdigit():
+                yield 'number', int(token)
+                i += 1
+                continue
+            for n in range(min(self.longest, end - i), 0, -1):
+                found = phrases.get(tokens[i:i + n])
+                if found:
+                    yield found
+                    i += n
+                    break
+            else:
+                i += 1
+
+    def parse(self, text, current=None, default=MAX_LEVEL):
+        """ Brightness asked for in text
+
+        Args:
+            text (str): the brightness phrase or a whole utterance
+            current (int): level (0-30) shown now, None if unknown
+            default (int): level assumed when current is unknown
+        Returns:
+            (Brightness): percent is None if nothing was understood
+        """
+        if current is None:
+            current = default
+        value, change, levels = self._interpret(text or '')
+        if change is None:
+            if levels and value is not None:
+                value = int(_linear_percent(value))
+            return Brightness(value, current, False)
+        if levels:
+            target = _linear_percent(
+                max(0, min(MAX_LEVEL, current + change)))
+        else:
+            target = _linear_percent(current) + change
+        return Brightness(max(0, min(100, int(target + 0.5))),
+                          current, True)
+
+    def _interpret(self, text):
+        """ (value, None, levels) for an absolute brightness, (None,
+        change, levels) for a relative one and (None, None, False) if not
+        understood, levels telling if the numbers are faceplate levels
+        rather than percentages.
+        Memoized, the same few phrases come up again and again.
+        """
+        tokens = tokenize(text)
+        named = self.levels.get(tokens)
+        if named is not None:
+            return named, None, False
+
+        number = direction = None
+        percent = level = change = small = False
+        for meaning, value in self._scan(tokens):
+            if meaning == 'number':
+                if number is None:
+                    number = value
+            elif meaning == 'up':
+                direction = 1
+            elif meaning == 'down':
+                direction = -1
+            elif meaning == 'percent':
+                percent = True
+            elif meaning == 'level':
+                level = True
+            elif meaning == 'by':
+                change = number is None
+            elif meaning == 'small':
+                small = True
+
+        if direction and (change or number is None):
+            if number is None:
+                return None, direction * (self.SMALL_STEP if small
+                                          else self.STEP), False
+            by_level = level and not percent
+            return None, direction * number, by_level
+
+        if number is None or number > 100:
+            return None, None, False
+        if percent:
+            return number, None, False
+        if number < 30 or (level and number <= MAX_LEVEL):
+            # Assume plain 0-30 is "level"
+            return number, None, True
+        # Assume plain 31-100 is "percentage"
+        return number, None, False
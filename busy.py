@@ -0,0 +1,235 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+def compile_ignore(patterns):
+    """ Build a matcher for handler names which should never show busy
+
+    Args:
+        patterns (list): substrings, a handler containing any is ignored
+    Returns:
+        (callable): returns a match for ignored handler names, else None
+    """
+    patterns = [p.strip() for p in patterns if p and p.strip()]
+    if not patterns:
+        return lambda handler: None
+    return re.compile('|'.join(re.escape(p) for p in patterns)).search
+
+
+class HandlerTracker(object):
+    """ Handlers currently running, as seen on the messagebus
+
+    Holds a value per running handler (the interaction id when it started,
+    or -1 once the hourglass is shown), and whether the handler is still
+    waiting to give the user any feedback.  Handlers which never report
+    back can't make it grow forever: entries older than ttl seconds, and
+    the least recently started ones beyond max_size, are evicted.
+
+    Args:
+        ignore (list): substrings of handler names to ignore
+        max_size (int): maximum number of tracked handlers
+        ttl (float): seconds after which a handler is forgotten
+        clock (callable): monotonic time source
+    """
+    def __init__(self, ignore=(), max_size=64, ttl=300,
+                 clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.tracked = 0
+        self.evicted = 0
+        self.ignored = 0
+        self._handlers = OrderedDict()
+        self._lock = Lock()
+        self.set_ignore(ignore)
+
+    def set_ignore(self, patterns):
+        """ Replace the list of ignored handler name substrings """
+        self._ignore = compile_ignore(patterns)
+        self._ignore_cache = {}
+
+    def is_ignored(self, handler):
+        """ True if the busy visual should never be shown for handler """
+        ignored = self._ignore_cache.get(handler)
+        if ignored is None:
+            if len(self._ignore_cache) > 4 * self.max_size:
+                self._ignore_cache = {}
+            ignored = self._ignore(handler) is not None
+            self._ignore_cache[handler] = ignored
+        if ignored:
+            self.ignored += 1
+        return ignored
+
+    def _expire(self, now):
+        handlers = self._handlers
+        while handlers:
+            handler, (value, stamp, waiting) = next(iter(handlers.items()))
+            if len(handlers) <= self.max_size and now - stamp < self.ttl:
+                break
+            del handlers[handler]
+            self.evicted += 1
+
+    def start(self, handler, value):
+        """ Track a handler which just started """
+        with self._lock:
+            now = self.clock()
+            self._handlers.pop(handler, None)
+            self._handlers[handler] = (value, now, True)
+            self.tracked += 1
+            self._expire(now)
+
+    def get(self, handler, default=None):
+        entry = self._handlers.get(handler)
+        return default if entry is None else entry[0]
+
+    def update(self, handler, value):
+        """ Change the value of a tracked handler, if still tracked """
+        with self._lock:
+            entry = self._handlers.get(handler)
+            if entry is not None:
+                self._handlers[handler] = (value, entry[1], entry[2])
+
+    def feedback(self, handler=None):
+        """ The user noticed something, from one handler or any
+
+        Returns:
+            (list): (handler, seconds since it started) of the handlers
+                    which hadn't given any feedback before
+        """
+        with self._lock:
+            now = self.clock()
+            names = [handler] if handler else list(self._handlers)
+            waited = []
+            for name in names:
+                entry = self._handlers.get(name)
+                if entry is None or not entry[2]:
+                    continue
+                self._handlers[name] = (entry[0], entry[1], False)
+                waited.append((name, now - entry[1]))
+            return waited
+
+    def complete(self, handler):
+        """ Stop tracking a handler
+
+        Returns:
+            value of the handler or None if it wasn't tracked
+        """
+        with self._lock:
+            entry = self._handlers.pop(handler, None)
+        return None if entry is None else entry[0]
+
+    def __contains__(self, handler):
+        return handler in self._handlers
+
+    def __len__(self):
+        return len(self._handlers)
+
+    def stats(self):
+        """ Counters for diagnostics """
+        return {'active': len(self._handlers), 'tracked': self.tracked,
+                'evicted': self.evicted, 'ignored': self.ignored}
+
+
+class HandlerTimes(object):
+    """ How long each handler takes before the user notices anything
+
+    Kept as a running estimate per handler: an exponentially weighted
+    mean of the response times and of their deviation from it, so each
+    handler takes three numbers however often it runs.  Only the most
+    recently seen handlers, up to max_size, are kept.
+
+    Args:
+        fast (float): handlers reliably responding in less never show
+                      the hourglass
+        slow (float): handlers reliably taking longer show it at once
+        max_size (int): maximum number of handlers kept
+    """
+    ALPHA = 0.25       # weight of a new sample
+    MIN_SAMPLES = 3    # samples before an estimate is trusted
+
+    def __init__(self, fast=0.5, slow=1.0, max_size=256):
+        self.fast = fast
+        self.slow = slow
+        self.max_size = max_size
+        self._times = OrderedDict()  # handler: [mean, deviation, samples]
+        self._lock = Lock()
+
+    def record(self, handler, seconds):
+        """ Learn from a handler taking seconds to respond """
+        with self._lock:
+            entry = self._times.pop(handler, None)
+            if entry is None:
+                entry = [seconds, seconds / 2, 0]
+            mean, deviation, samples = entry
+            error = seconds - mean
+            entry = [mean + HandlerTimes.ALPHA * error,
+                     deviation + HandlerTimes.ALPHA *
+                     (abs(error) - deviation),
+                     samples + 1]
+            self._times[handler] = entry
+            while len(self._times) > self.max_size:
+                self._times.popitem(last=False)
+
+    def estimate(self, handler):
+        """ (mean, deviation, samples) of a handler, None if never seen """
+        entry = self._times.get(handler)
+        return None if entry is None else tuple(entry)
+
+    def delay(self, handler, default):
+        """ Seconds before showing the hourglass for handler
+
+        Args:
+            handler (str): handler name
+            default (float): delay for handlers without an estimate
+        Returns:
+            (float): 0 for known slow handlers, None for known fast
+                     ones which should never show it
+        """
+        entry = self._times.get(handler)
+        if entry is None or entry[2] < HandlerTimes.MIN_SAMPLES:
+            return default
+        mean, deviation, samples = entry
+        if mean + 2 * deviation < self.fast:
+            return None
+        if mean - deviation > self.slow:
+            return 0
+        return default
+
+    def as_dict(self):
+        with self._lock:
+            return {handler: [round(mean, 4), round(deviation, 4), samples]
+                    for handler, (mean, deviation, samples)
+                    in self._times.items()}
+
+    def load(self, data):
+        """ Restore estimates saved with as_dict(), bad entries skipped """
+        with self._lock:
+            for handler, entry in data.items():
+                try:
+                    mean, deviation, samples = entry
+                    self._times[str(handler)] = [float(mean),
+                                                 float(deviation),
+                                                 int(samples)]
+                except (TypeError, ValueError):
+                    continue
+            while len(self._times) > self.max_size:
+                self._times.popitem(last=False)
+
+    def __len__(self):
+        return len(self._times)
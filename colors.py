@@ -0,0 +1,445 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from ast import literal_eval as parse_tuple
+from bisect import bisect_left, bisect_right
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+
+def _hex_to_rgb(_hex):
+    """ Convert hex color code to RGB tuple
+    Args:
+        hex (str): Hex color string, e.g '#ff12ff' or 'ff12ff'
+    Returns:
+        (rgb): tuple i.e (123, 200, 155) or None
+    """
+    try:
+        if '#' in _hex:
+            _hex = _hex.replace('#', "").strip()
+        if len(_hex) != 6:
+            return None
+        (r, g, b) = int(_hex[0:2], 16), int(_hex[2:4], 16), int(_hex[4:6], 16)
+        return (r, g, b)
+    except Exception:
+        return None
+
+
+def fuzzy_match_color(color_a, color_dict):
+    """ fuzzy match for colors
+
+        Args:
+            color_a (str): color as string
+            color_dict (dict): dict with colors
+        Returns:
+            color: color from color_dict
+    """
+    from difflib import SequenceMatcher
+
+    highest_ratio = float("-inf")
+    _color = None
+    for color, value in color_dict.items():
+        s = SequenceMatcher(None, color_a, color)
+        if s.ratio() > highest_ratio:
+            highest_ratio = s.ratio()
+            _color = color
+    if highest_ratio > 0.8:
+        return _color
+    else:
+        return None
+
+
+class ColorIndex(object):
+    """ Prebuilt index for fuzzy matching color names
+
+    Gives the same answers as comparing the query against every color with
+    difflib.SequenceMatcher, but only computes the full ratio for colors
+    which could beat the best match found so far.  Candidates are pruned
+    with two upper bounds of the ratio: the lengths of both strings and the
+    characters they have in common (difflib's quick_ratio()).
+
+    Args:
+        color_dict (dict): color names mapped to their values
+        threshold (float): ratio a match has to exceed
+    """
+    def __init__(self, color_dict, threshold=0.8):
+        from difflib import SequenceMatcher
+
+        self.threshold = threshold
+        self.names = list(color_dict)
+        self._rank = {name: i for i, name in enumerate(self.names)}
+        self._chars = [Counter(name) for name in self.names]
+        # The compared color is the second sequence, difflib caches its
+        # character positions so the matchers are built only once.
+        self._matchers = [SequenceMatcher(None, '', name)
+                          for name in self.names]
+        self._by_length = sorted(range(len(self.names)),
+                                 key=lambda i: len(self.names[i]))
+        self._lengths = [len(self.names[i]) for i in self._by_length]
+
+    def _bounded(self, query, threshold):
+        """ (bound, index) of colors whose ratio could exceed threshold """
+        # ratio <= 2 * min(len_a, len_b) / (len_a + len_b)
+        size = len(query)
+        low = bisect_left(self._lengths, size * threshold / (2 - threshold))
+        high = bisect_right(self._lengths, size * (2 - threshold) / threshold)
+
+        chars = Counter(query)
+        found = []
+        for i in self._by_length[low:high]:
+            common = sum((chars & self._chars[i]).values())
+            bound = 2.0 * common / (size + len(self.names[i]))
+            if bound > threshold:
+                found.append((bound, i))
+        return found
+
+    def _ratio(self, query, i):
+        matcher = self._matchers[i]
+        matcher.set_seq1(query)
+        return matcher.ratio()
+
+    def candidates(self, query, k=5, threshold=None):
+        """ Best matching colors for query
+
+        Args:
+            query (str): color name as heard
+            k (int): maximum number of candidates to return
+            threshold (float): minimum ratio, defaults to the index threshold
+        Returns:
+            list: (color, ratio) tuples, best first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        if not query:
+            return []
+
+        found = []
+        for bound, i in sorted(self._bounded(query, threshold),
+                               key=lambda c: (-c[0], c[1])):
+            if len(found) >= k and bound < found[-1][0]:
+                break  # nothing left can make it into the top k
+            ratio = self._ratio(query, i)
+            if ratio > threshold:
+                found.append((ratio, i))
+                found.sort(key=lambda c: (-c[0], c[1]))
+                del found[k:]
+        return [(self.names[i], ratio) for ratio, i in found]
+
+    def match(self, query):
+        """ Color in the index best matching query
+
+        Args:
+            query (str): color name as heard
+        Returns:
+            (str): color name or None if nothing is close enough
+        """
+        if query in self._rank:
+            return query
+        found = self.candidates(query, k=1)
+        return found[0][0] if found else None
+
+
+@lru_cache(maxsize=64)
+def parse_color_code(color):
+    """ Convert an rgb tuple string or hex color code to RGB
+
+    Results are cached, the same few codes are parsed over and over again
+    when the eye color comes from the web settings.
+
+    Args:
+        color (str): rgb tuple like '(0,0,128)' or hex like '#0000cc'
+    Returns:
+        (r, g, b) (tuple): Tuple of rgb values (0-255) or None
+    """
+    # check if rgb tuple like '(0,0,128)'
+    try:
+        (r, g, b) = parse_tuple(color)
+        if 0 <= r <= 255 and 0 <= g <= 255 and 0 <= b <= 255:
+            return (r, g, b)
+        else:
+            return None
+    except Exception:
+        pass
+
+    # Finally check if color is hex, like '#0000cc' or '0000cc'
+    return _hex_to_rgb(color)
+
+
+class ColorTable(object):
+    """ Named colors compiled to RGB tuples
+
+    The hex codes from colors.value are decoded once when the table is
+    built.  The table also answers the reverse question, which named color
+    is closest to an RGB value, by comparing against flat per-channel
+    lists of the whole table.
+
+    Args:
+        color_dict (dict): color names mapped to hex codes
+        rgb (dict): color names mapped to already decoded (r, g, b)
+    """
+    def __init__(self, color_dict, rgb=None):
+        self.rgb = {}
+        if rgb is not None:
+            for name, value in rgb.items():
+                self.rgb[name] = tuple(value) if value else None
+        else:
+            for name, code in color_dict.items():
+                self.rgb[name] = _hex_to_rgb(code)
+
+        self._names = []
+        reds, greens, blues = [], [], []
+        exact = {}
+        for name, rgb in self.rgb.items():
+            if rgb is None:
+                continue
+            exact.setdefault(rgb, name)
+            self._names.append(name)
+            reds.append(rgb[0])
+            greens.append(rgb[1])
+            blues.append(rgb[2])
+        self._exact = exact
+        self._channels = (reds, greens, blues)
+
+    def parse(self, color):
+        """ Convert color descriptor to RGB
+
+        Parse a color name ('dark blue'), hex ('#000088') or rgb tuple
+        '(0,0,128)' to an RGB tuple.
+
+        Args:
+            color (str): RGB, Hex, or color from the table
+        Returns:
+            (r, g, b) (tuple): Tuple of rgb values (0-255) or None
+        """
+        if not color or not isinstance(color, str):
+            return None
+
+        # check if named color in table
+        name = color.lower()
+        if name in self.rgb:
+            return self.rgb[name]
+        return parse_color_code(color)
+
+    def nearest(self, rgb):
+        """ Name of the color in the table closest to rgb
+
+        Distances use the "redmean" weighting, a cheap approximation of
+        how different two colors look.
+
+        Args:
+            rgb (tuple): (r, g, b) values 0-255
+        Returns:
+            (str): color name or None for an empty table
+        """
+        r, g, b = (int(c) for c in rgb)
+        if (r, g, b) in self._exact:
+            return self._exact[(r, g, b)]
+        if not self._names:
+            return None
+
+        reds, greens, blues = self._channels
+        best, best_distance = 0, float('inf')
+        for i, (r2, g2, b2) in enumerate(zip(reds, greens, blues)):
+            mean = (r + r2) >> 1
+            dr, dg, db = r - r2, g - g2, b - b2
+            distance = (((512 + mean) * dr * dr) >> 8) + 4 * dg * dg + \
+                (((767 - mean) * db * db) >> 8)
+            if distance < best_distance:
+                best, best_distance = i, distance
+        return self._names[best]
+
+
+def lighten(rgb, amount):
+    """ rgb mixed with white, amount (0-1) being the share of white """
+    return tuple(int(c + (255 - c) * amount + 0.5) for c in rgb)
+
+
+# Result of CustomColorParser.parse(); rgb holds the red, green and blue
+# values heard, None where a value is missing or not 0-255, and shade is
+# -1 for a darker and 1 for a lighter version of the color.  kind tells
+# where rgb came from, 'color' for a color name, 'code' for a hex code
+# and 'values' for values, and shade_word is the phrase of the shade.
+CustomColor = namedtuple('CustomColor',
+                         ['rgb', 'shade', 'kind', 'shade_word'])
+
+# Words, and hex codes written with their '#'
+_WORD = re.compile(r'#?\w+')
+_HEX_DIGITS = frozenset('0123456789abcdef')
+
+
+def _words(text):
+    return tuple(_WORD.findall(text.lower()))
+
+
+def _is_hex(token):
+    return all(c in _HEX_DIGITS for c in token)
+
+
+def _code(digits):
+    # RGB of 6 or 3 hex digits, None if they aren't
+    if len(digits) == 3:
+        digits = ''.join(c * 2 for c in digits)
+    return _hex_to_rgb(digits) if _is_hex(digits) else None
+
+
+class CustomColorParser(object):
+    """ Understands a whole custom color in a single utterance
+
+    Built once per language, from the color names, number words and the
+    words of colors.words.value.  Understands
+
+        red 10 green 200 blue 30    values named by their channel
+        34 167 240                  plain values, in red, green, blue order
+        hex 2 2 a 7 f 0, #22a7f0    hex codes, spoken or written after
+                                    '#' or a hex word
+        darker teal                 a named color with a shade
+
+    The meanings in colors.words.value are
+
+        red, green, blue   the number following is for that channel
+        hex                hex digits follow
+        darker, lighter    a shade of the color
+
+    A channel word not followed by a number, like the "red" in "darker
+    red", is the color of that name.
+
+    Args:
+        rgb (dict): color names mapped to (r, g, b)
+        words (dict): word or phrase mapped to its meaning, see above
+        numbers (dict): number words mapped to their value
+    """
+    CHANNELS = ('red', 'green', 'blue')
+
+    def __init__(self, rgb, words=None, numbers=None):
+        self.phrases = {}
+        for phrase, value in (numbers or {}).items():
+            self.phrases[_words(phrase)] = ('number', int(value))
+        for name, value in rgb.items():
+            if value:
+                self.phrases[_words(name)] = ('color', tuple(value))
+        for phrase, meaning in (words or {}).items():
+            key = _words(phrase)
+            # Keep the color of a channel word which is a color name too
+            named = self.phrases.get(key, (None, None))
+            self.phrases[key] = (meaning, named[1] if named[0] == 'color'
+                                 else None)
+        self.longest = max([len(p) for p in self.phrases] + [1])
+        self._interpret = lru_cache(maxsize=64)(self._interpret)
+
+    def _lookup(self, tokens, i):
+        """ (meaning, value) of the longest phrase at tokens[i], and its
+        length in tokens
+        """
+        token = tokens[i]
+        if token.isdigit():
+            return ('number', int(token)), 1
+        for n in range(min(self.longest, len(tokens) - i), 0, -1):
+            found = self.phrases.get(tokens[i:i + n])
+            if found:
+                return found, n
+        return None, 1
+
+    def byte(self, text):
+        """ The first number in text if it is 0-255, else None
+
+        Used to validate the answers when asking for single values.
+        """
+        tokens = _words(text or '')
+        i = 0
+        while i < len(tokens):
+            found, n = self._lookup(tokens, i)
+            if found and found[0] == 'number':
+                return found[1] if 0 <= found[1] <= 255 else None
+            i += n
+        return None
+
+    def parse(self, text):
+        """ Custom color asked for in text
+
+        Args:
+            text (str): the color phrase or a whole utterance
+        Returns:
+            (CustomColor): rgb is (None, None, None) if nothing was
+                           understood
+        """
+        return self._interpret(text or '')
+
+    def _hex(self, tokens, i):
+        # Hex digits spoken as words, letters and numbers from tokens[i]
+        digits = ''
+        while i < len(tokens) and len(digits) < 6:
+            if _is_hex(tokens[i]):
+                digits += tokens[i]
+                i += 1
+                continue
+            found, n = self._lookup(tokens, i)
+            if not found or found[0] != 'number':
+                break
+            digits += str(found[1])
+            i += n
+        return _code(digits), i
+
+    def _interpret(self, text):
+        """ CustomColor for text, memoized """
+        tokens = _words(text)
+        values = [None, None, None]
+        loose = []  # values without a channel word
+        color = kind = None
+        shade = 0
+        shade_word = None
+        channel = named = None  # channel word waiting for its value
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token.startswith('#'):
+                code = _code(token[1:])
+                found, n = ('code', code) if code else None, 1
+            else:
+                found, n = self._lookup(tokens, i)
+            start = i
+            i += n
+            if found is None:
+                continue
+            meaning, value = found
+            if meaning == 'number' and channel is not None:
+                values[channel] = value if value <= 255 else None
+                channel = named = None
+                continue
+            if named is not None:
+                color, kind = named, 'color'  # "darker red", not "red 10"
+            channel = named = None
+
+            if meaning == 'number':
+                loose.append(value)
+            elif meaning in self.CHANNELS:
+                channel = self.CHANNELS.index(meaning)
+                named = value
+            elif meaning in ('color', 'code'):
+                color, kind = value, meaning
+            elif meaning == 'hex':
+                color, i = self._hex(tokens, i)
+                kind = 'code'
+            elif meaning in ('darker', 'lighter'):
+                shade = -1 if meaning == 'darker' else 1
+                shade_word = ' '.join(tokens[start:i])
+        if named is not None:
+            color, kind = named, 'color'
+
+        if color is not None:
+            return CustomColor(color, shade, kind, shade_word)
+        if values == [None, None, None]:
+            # Plain values, in order
+            for idx, value in enumerate(loose[:3]):
+                values[idx] = value if value <= 255 else None
+        return CustomColor(tuple(values), shade, 'values', shade_word)
@@ -0,0 +1,355 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import deque
+from threading import Lock, RLock
+
+
+# The eyes are two rings of 12 NeoPixels, left eye is 0-11, right is 12-23
+EYE_PIXELS = 24
+
+
+class SerialGovernor(object):
+    """ Token bucket pacing writes to the faceplate serial link
+
+    The Mark 1 enclosure talks to the Arduino at 9600 baud (8N1, so
+    roughly 960 bytes a second) and the Arduino only buffers 64 bytes of
+    incoming data.  Instead of sleeping a fixed time after each command,
+    callers ask the governor for the number of bytes a command will take
+    on the wire and only wait when the link would otherwise overflow.
+
+    Args:
+        rate (int): link bandwidth in bytes per second
+        burst (int): bytes which can be sent back-to-back (receive buffer)
+        clock (callable): monotonic time source
+        sleep (callable): used to wait for the link to drain
+    """
+    BAUD_RATE = 9600
+    RATE = BAUD_RATE // 10  # 8 data bits + start and stop bit
+    BURST = 64              # Arduino HardwareSerial receive buffer
+
+    def __init__(self, rate=RATE, burst=BURST,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._stamp = clock()
+        self._lock = Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def delay(self, nbytes):
+        """ Seconds to wait before nbytes can be sent without overflow """
+        with self._lock:
+            self._refill()
+            return max(0.0, (min(nbytes, self.burst) - self._tokens) /
+                       self.rate)
+
+    def acquire(self, nbytes):
+        """ Block until nbytes can be written, then account for them
+
+        Args:
+            nbytes (int): size of the command on the serial link
+        Returns:
+            (float): seconds spent waiting for the link
+        """
+        waited = 0.0
+        with self._lock:
+            self._refill()
+            needed = min(nbytes, self.burst)
+            if self._tokens < needed:
+                waited = (needed - self._tokens) / self.rate
+                self._sleep(waited)
+                self._refill()
+            self._tokens -= nbytes
+        return waited
+
+
+def pack_rgb(r, g, b):
+    """ Pack an RGB triple the way the enclosure sends it to the Arduino """
+    return (int(r) << 16) | (int(g) << 8) | int(b)
+
+
+def setpixel_cost(idx, color):
+    """ Bytes an 'eyes.setpixel' command takes on the serial link
+
+    Args:
+        idx (int): pixel index (0-23)
+        color (int): packed RGB value, see pack_rgb()
+    """
+    return len('eyes.setpixel={},{}\n'.format(idx, color))
+
+
+def color_cost(color):
+    """ Bytes an 'eyes.color' command takes on the serial link """
+    return len('eyes.color={}\n'.format(color))
+
+
+def command_cost(name, args=()):
+    """ Bytes any enclosure command takes on the serial link
+
+    Args:
+        name (str): EnclosureAPI method, e.g. 'eyes_look'
+        args (list): arguments of the call
+    """
+    return len('{}={}\n'.format(name.replace('_', '.', 1),
+                                ','.join(str(a) for a in args)))
+
+
+# Eye messages which leave the pixels in a state we can't know
+EYE_ANIMATIONS = ('enclosure.eyes.on', 'enclosure.eyes.off',
+                  'enclosure.eyes.blink', 'enclosure.eyes.narrow',
+                  'enclosure.eyes.look', 'enclosure.eyes.fill',
+                  'enclosure.eyes.reset', 'enclosure.eyes.spin',
+                  'enclosure.eyes.timedspin', 'enclosure.eyes.volume')
+# Eye messages which set a pixel, the color or the brightness
+EYE_WRITES = ('enclosure.eyes.color', 'enclosure.eyes.setpixel',
+              'enclosure.eyes.level')
+# Messages which reset the whole faceplate
+FACE_RESETS = ('enclosure.reset', 'enclosure.mouth.reset')
+# Other commands whose echo is recognized, see EyeFramebuffer.own_echo()
+MOUTH_ANIMATIONS = ('enclosure.mouth.think',)
+
+
+def _echo_key(msg_type, data=None):
+    """ Identify a write by the bus message it will show up as """
+    if msg_type not in EYE_WRITES:
+        return (msg_type,)
+    return (msg_type,) + tuple(sorted((k, int(v)) for k, v in data.items()))
+
+
+class EyeFramebuffer(object):
+    """ In-memory frame of the 24 eye pixels
+
+    Visuals are drawn into the frame and then pushed with flush(), which
+    compares against the last frame sent and only writes the pixels that
+    actually changed.  Writes are paced by a SerialGovernor instead of
+    fixed sleeps.
+
+    The last frame sent and the brightness form a mirror of what the
+    faceplate shows, color() and brightness() drop writes which wouldn't
+    change anything.  Eye messages from other skills, seen through
+    observe(), make the affected state unknown again so the next write
+    goes through.
+
+    Only the animator draws, but observe() runs on the bus thread, so
+    the mirror is guarded by a lock which is never held while waiting
+    for the serial link.
+
+    Args:
+        enclosure (EnclosureAPI): enclosure to draw on
+        governor (SerialGovernor): pacing for the serial link
+        metrics (Metrics): where commands, bytes and waits are recorded
+    """
+    def __init__(self, enclosure, governor=None, metrics=None):
+        self.enclosure = enclosure
+        self.governor = governor or SerialGovernor()
+        self.metrics = metrics
+        self.frame = [None] * EYE_PIXELS
+        self._sent = [None] * EYE_PIXELS
+        self._level = None
+        self._echoes = deque(maxlen=64)  # our writes not yet seen on the bus
+        self.dropped = 0
+        self._lock = RLock()
+
+    def _acquire(self, nbytes):
+        waited = self.governor.acquire(nbytes)
+        if self.metrics:
+            self.metrics.count('serial.bytes', nbytes)
+            if waited:
+                self.metrics.observe('serial.wait', waited)
+
+    def _call(self, name, *args, **kwargs):
+        # Every enclosure command goes through here
+        if not self.metrics:
+            return getattr(self.enclosure, name)(*args, **kwargs)
+        with self.metrics.timed('enclosure.' + name):
+            return getattr(self.enclosure, name)(*args, **kwargs)
+
+    def fill(self, rgb):
+        """ Set every pixel in the frame to rgb """
+        self.frame = [pack_rgb(*rgb)] * EYE_PIXELS
+
+    def set_pixel(self, idx, rgb):
+        self.frame[idx] = pack_rgb(*rgb)
+
+    def set_pixels(self, indexes, rgb):
+        color = pack_rgb(*rgb)
+        for idx in indexes:
+            self.frame[idx] = color
+
+    def current(self):
+        """ Packed colors last sent, None for unknown pixels """
+        with self._lock:
+            return list(self._sent)
+
+    def changed(self):
+        """ List of (index, color) pixels which differ from the faceplate """
+        return [(idx, color) for idx, color in enumerate(self.frame)
+                if color is not None and color != self._sent[idx]]
+
+    def flush(self):
+        """ Push the changed pixels of the frame to the faceplate
+
+        Returns:
+            (int): number of enclosure commands sent
+        """
+        with self._lock:
+            changes = self.changed()
+        if not changes:
+            return 0
+
+        solid = len(set(self.frame)) == 1 and None not in self.frame
+        if solid and len(changes) == EYE_PIXELS:
+            # A single eyes.color beats 24 setpixels.  With only some
+            # pixels changed it would also redraw the others, which
+            # may show a faceplate animation, like lowered eyes.
+            self._write_color(self.frame[0])
+            return 1
+
+        for idx, color in changes:
+            r, g, b = color >> 16, (color >> 8) & 0xFF, color & 0xFF
+            self._acquire(setpixel_cost(idx, color))
+            with self._lock:
+                self._echoes.append(_echo_key('enclosure.eyes.setpixel',
+                                              {'idx': idx, 'r': r, 'g': g,
+                                               'b': b}))
+                self._call('eyes_setpixel', idx, r=r, g=g, b=b)
+                self._sent[idx] = color
+        return len(changes)
+
+    def _write_color(self, color):
+        r, g, b = color >> 16, (color >> 8) & 0xFF, color & 0xFF
+        self._acquire(color_cost(color))
+        with self._lock:
+            self._echoes.append(_echo_key('enclosure.eyes.color',
+                                          {'r': r, 'g': g, 'b': b}))
+            self._call('eyes_color', r, g, b)
+            self._sent = [color] * EYE_PIXELS
+            self.frame = list(self._sent)
+
+    def color(self, rgb):
+        """ Set all pixels to rgb, unless they already are
+
+        Returns:
+            (bool): True if a command was sent
+        """
+        color = pack_rgb(*rgb)
+        with self._lock:
+            if self._sent == [color] * EYE_PIXELS:
+                self.dropped += 1
+                self.frame = list(self._sent)
+                return False
+        self._write_color(color)
+        return True
+
+    def brightness(self, level):
+        """ Set the eye brightness (0-30), unless it already is
+
+        Returns:
+            (bool): True if a command was sent
+        """
+        level = int(level)
+        with self._lock:
+            if level == self._level:
+                self.dropped += 1
+                return False
+        self._acquire(command_cost('eyes_level', (level,)))
+        with self._lock:
+            self._echoes.append(_echo_key('enclosure.eyes.level',
+                                          {'level': level}))
+            self._call('eyes_brightness', level)
+            self._level = level
+        return True
+
+    def command(self, name, args=(), forget=()):
+        """ Run one of the faceplate's own animations
+
+        Args:
+            name (str): EnclosureAPI method, e.g. 'eyes_blink' or
+                        'mouth_think'
+            args (list): arguments of the call
+            forget (list): pixels left in an unknown state afterwards
+        """
+        self._acquire(command_cost(name, args))
+        msg_type = 'enclosure.' + name.replace('_', '.', 1)
+        with self._lock:
+            if msg_type in EYE_ANIMATIONS or msg_type in MOUTH_ANIMATIONS:
+                self._echoes.append(_echo_key(msg_type))
+            self._call(name, *args)
+            for idx in forget:
+                self._sent[idx] = None
+
+    def reset(self, command=None):
+        """ Forget everything known about the faceplate
+
+        Args:
+            command (str): EnclosureAPI reset to send first, 'reset' or
+                           'mouth_reset'
+        """
+        if command:
+            self._acquire(command_cost(command))
+        with self._lock:
+            if command:
+                self._echoes.append(
+                    _echo_key('enclosure.' + command.replace('_', '.', 1)))
+                self._call(command)
+            self._sent = [None] * EYE_PIXELS
+            self._level = None
+
+    def own_echo(self, message):
+        """ True if message is a command sent from here showing up on
+        the bus, which then isn't expected again
+        """
+        with self._lock:
+            try:
+                key = _echo_key(message.msg_type, message.data)
+            except (AttributeError, TypeError, ValueError):
+                return False
+            if key in self._echoes:
+                self._echoes.remove(key)
+                return True
+            return False
+
+    def observe(self, message):
+        """ Keep the mirror honest about eye messages seen on the bus
+
+        Args:
+            message (Message): any of EYE_WRITES, EYE_ANIMATIONS or
+                               FACE_RESETS
+        """
+        with self._lock:
+            if self.own_echo(message):
+                return  # our own write, already mirrored
+
+            if message.msg_type in FACE_RESETS:
+                self._sent = [None] * EYE_PIXELS
+                self._level = None
+            elif message.msg_type == 'enclosure.eyes.level':
+                self._level = None
+            elif message.msg_type == 'enclosure.eyes.setpixel':
+                idx = message.data.get('idx')
+                if idx in range(EYE_PIXELS):
+                    self._sent[idx] = None
+                else:
+                    self._sent = [None] * EYE_PIXELS
+            else:
+                self._sent = [None] * EYE_PIXELS
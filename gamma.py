@@ -0,0 +1,103 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DEFAULT_GAMMA = 2.2
+
+
+def parse_gamma(value, default=DEFAULT_GAMMA):
+    """ Gamma setting to an (r, g, b) tuple of exponents
+
+    Args:
+        value (str): one exponent, or three separated by commas
+        default (float): used when value isn't valid
+    Returns:
+        (tuple): exponent of the red, green and blue LEDs
+    """
+    try:
+        parts = [float(part) for part in str(value).split(',')]
+    except ValueError:
+        parts = []
+    if len(parts) == 1:
+        parts *= 3
+    if len(parts) != 3 or not all(0.1 <= part <= 5 for part in parts):
+        return (default,) * 3
+    return tuple(parts)
+
+
+def _scale(value, factor, top):
+    # Never round a lit channel down to off, that changes the hue
+    scaled = int(value * factor + 0.5)
+    return min(top, max(1, scaled)) if value > 0 else 0
+
+
+class LedCurve(object):
+    """ Lookup tables dimming colors along the LED response
+
+    The faceplate drives its LEDs with PWM, so the light given off is
+    proportional to the value written, but the eye sees it as roughly
+    value ** (1 / gamma).  Halving a channel therefore hardly looks
+    darker.
+
+    For every dimming factor asked for, one table of 256 entries per
+    color channel is computed once.  Dimming a color, or a whole frame,
+    is then a lookup per channel.
+
+    The 0-30 faceplate brightness levels are left linear: along the
+    curve the lowest third of the percentages would all land on level 1.
+
+    Args:
+        gamma (tuple): exponent of the red, green and blue LEDs, 1.0 is
+                       linear
+    """
+    def __init__(self, gamma=(DEFAULT_GAMMA,) * 3):
+        self.gamma = tuple(gamma)
+        self._dim_tables = {}
+
+    def dim_tables(self, factor):
+        """ (red, green, blue) tables of 256 values dimmed to factor
+
+        Args:
+            factor (float): perceived brightness kept, 0.5 is half as bright
+        """
+        tables = self._dim_tables.get(factor)
+        if tables is None:
+            tables = tuple(
+                tuple(_scale(value, factor ** gamma, 255)
+                      for value in range(256))
+                for gamma in self.gamma)
+            self._dim_tables[factor] = tables
+        return tables
+
+    def dim(self, rgb, factor):
+        """ rgb (r, g, b) looking factor as bright, with the same hue """
+        red, green, blue = self.dim_tables(factor)
+        r, g, b = rgb
+        return red[int(r)], green[int(g)], blue[int(b)]
+
+    def dim_frame(self, pixels, factor):
+        """ Dim a whole frame of (r, g, b) tuples, None stays None
+
+        Eye frames hold only a few distinct colors, each is looked up
+        once.
+        """
+        red, green, blue = self.dim_tables(factor)
+        done = {None: None}
+        frame = []
+        for rgb in pixels:
+            out = done.get(rgb)
+            if out is None and rgb is not None:
+                r, g, b = rgb
+                out = done[rgb] = red[int(r)], green[int(g)], blue[int(b)]
+            frame.append(out)
+        return frame
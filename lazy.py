@@ -0,0 +1,53 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from threading import Lock
+
+
+class Lazy(object):
+    """ Value built on first use
+
+    Safe to use from several threads, the loader runs only once even when
+    a background warm-up and a handler ask for the value at the same time.
+
+    Args:
+        loader (callable): builds the value
+    """
+    def __init__(self, loader):
+        self.loader = loader
+        self.load_time = None  # seconds the loader took
+        self._value = None
+        self._loaded = False
+        self._lock = Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    start = time.monotonic()
+                    self._value = self.loader()
+                    self.load_time = time.monotonic() - start
+                    self._loaded = True
+        return self._value
+
+    def reset(self):
+        """ Load again on next use """
+        with self._lock:
+            self._value = None
+            self._loaded = False
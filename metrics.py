@@ -0,0 +1,180 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+
+
+class Histogram(object):
+    """ Latencies counted in fixed buckets
+
+    Recording is a bisect and an increment, no samples are kept.
+    Percentiles are reported as the upper bound of their bucket.
+    """
+    # Upper bounds of the buckets in seconds, the last bucket is open
+    BOUNDS = (50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3,
+              25e-3, 50e-3, 100e-3, 250e-3, 500e-3, 1.0, 2.5)
+
+    def __init__(self):
+        self.buckets = [0] * (len(Histogram.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.buckets[bisect_left(Histogram.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """ Bucket bound below which p (0-1) of the samples fall """
+        if not self.count:
+            return 0.0
+        wanted = p * self.count
+        seen = 0
+        for bound, n in zip(Histogram.BOUNDS, self.buckets):
+            seen += n
+            if seen >= wanted:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        """ Summary in milliseconds, suitable for a bus message """
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            'count': self.count,
+            'mean_ms': round(mean * 1000, 3),
+            'p50_ms': round(self.percentile(0.5) * 1000, 3),
+            'p95_ms': round(self.percentile(0.95) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+            'total_ms': round(self.total * 1000, 3)
+        }
+
+
+class Metrics(object):
+    """ Counters and latency histograms of what the skill does
+
+    Cheap enough to leave on: a sample is a clock read, a lock and an
+    increment.  Gauges are functions read only when a snapshot is taken,
+    for counters other objects already keep.
+
+    Args:
+        clock (callable): high resolution time source
+    """
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.enabled = True
+        self.started = time.monotonic()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = Lock()
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        """ Record a latency sample in the histogram called name """
+        if self.enabled:
+            with self._lock:
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = self._histograms[name] = Histogram()
+                histogram.add(seconds)
+
+    def gauge(self, name, func):
+        """ Report func() as name in every snapshot """
+        self._gauges[name] = func
+
+    def timed(self, name):
+        """ Context manager recording how long its block takes """
+        return _Timed(self, name)
+
+    def wrap(self, name, func):
+        """ func, recording the time of every call as name """
+        @wraps(func)
+        def timed_func(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            start = self.clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(name, self.clock() - start)
+        return timed_func
+
+    def snapshot(self):
+        """ Current values of all counters, histograms and gauges
+
+        Returns:
+            (dict): plain data, suitable for a bus message
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            latency = {name: histogram.as_dict()
+                       for name, histogram in self._histograms.items()}
+        gauges = {}
+        for name, func in self._gauges.items():
+            try:
+                gauges[name] = func()
+            except Exception as e:
+                gauges[name] = repr(e)
+        return {
+            'uptime': round(time.monotonic() - self.started, 1),
+            'enabled': self.enabled,
+            'counters': counters,
+            'gauges': gauges,
+            'latency': latency
+        }
+
+    def summary(self):
+        """ One line overview for the log """
+        snapshot = self.snapshot()
+        commands = sum(h['count'] for name, h in snapshot['latency'].items()
+                       if name.startswith('enclosure.'))
+        slowest = sorted(snapshot['latency'].items(),
+                         key=lambda item: -item[1]['max_ms'])[:3]
+        return '{} enclosure commands in {:.0f}s, {} | slowest: {}'.format(
+            commands, snapshot['uptime'],
+            ', '.join('{}={}'.format(k, v) for k, v in
+                      sorted(snapshot['counters'].items())),
+            ', '.join('{} {}ms'.format(name, h['max_ms'])
+                      for name, h in slowest))
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+            self.started = time.monotonic()
+
+
+class _Timed(object):
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = self.metrics.clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, self.metrics.clock() - self.start)
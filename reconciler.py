@@ -0,0 +1,106 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from copy import deepcopy
+from threading import Lock
+
+
+class SettingsReconciler(object):
+    """ Runs settings handlers only for keys which really changed
+
+    The settings callback fires far more often than the settings change.
+    Each callback only (re)starts a short debounce timer; when it runs out
+    the settings are compared against the snapshot of the last pass and
+    only the handlers registered for changed keys are called.
+
+    Args:
+        settings (dict): the skill settings
+        timers (TimerQueue): where the debounce timer runs
+        debounce (float): seconds to wait for a burst of callbacks to end
+        log (Logger): where failing handlers are reported
+    """
+    def __init__(self, settings, timers, debounce=1.0, log=None):
+        self.settings = settings
+        self.timers = timers
+        self.debounce = debounce
+        self.log = log or logging.getLogger(__name__)
+        self.passes = 0
+        self.noops = 0
+        self._handlers = []
+        self._snapshot = {}
+        self._pending = None
+        self._lock = Lock()
+
+    def register(self, keys, handler):
+        """ Call handler(changed) when any of keys changes
+
+        Args:
+            keys (list): settings keys the handler depends on
+            handler (callable): called with a dict of the changed keys
+                                and their new values
+        """
+        keys = tuple(keys)
+        self._handlers.append((keys, handler))
+        for key in keys:
+            self._snapshot[key] = deepcopy(self.settings.get(key))
+
+    def notify(self):
+        """ Settings may have changed, reconcile once things calm down """
+        with self._lock:
+            if self._pending:
+                self._pending.cancel()
+            self._pending = self.timers.schedule(self.debounce,
+                                                 self.reconcile)
+
+    def changed(self):
+        """ Keys whose value differs from the last pass, and the new value """
+        changed = {}
+        for key, old in self._snapshot.items():
+            value = self.settings.get(key)
+            if value != old:
+                changed[key] = value
+        return changed
+
+    def reconcile(self):
+        """ Run the handlers of changed keys
+
+        Returns:
+            (dict): the changed keys and their new values
+        """
+        with self._lock:
+            self._pending = None
+            self.passes += 1
+            changed = self.changed()
+            if not changed:
+                self.noops += 1
+                return changed
+            for key, value in changed.items():
+                self._snapshot[key] = deepcopy(value)
+
+        for keys, handler in self._handlers:
+            relevant = {key: changed[key] for key in keys if key in changed}
+            if relevant:
+                try:
+                    handler(relevant)
+                except Exception:
+                    self.log.exception('Settings handler {} failed'.format(
+                        getattr(handler, '__name__', handler)))
+        return changed
+
+    def cancel(self):
+        with self._lock:
+            if self._pending:
+                self._pending.cancel()
+                self._pending = None
@@ -0,0 +1,137 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from datetime import date, datetime, timedelta
+from threading import Lock
+
+
+def warm_up():
+    """ Import the astronomy libraries ahead of their first use """
+    import astral  # noqa: F401
+    import arrow  # noqa: F401
+    import pytz  # noqa: F401
+
+
+def location_key(location):
+    """ Everything in the device location which moves the sun
+
+    Args:
+        location (dict): device location from the Mycroft configuration
+    Returns:
+        (tuple): hashable key, changes whenever the location or the
+                 timezone settings change
+    """
+    return (location['timezone']['code'],
+            location['timezone'].get('offset'),
+            location['coordinate']['latitude'],
+            location['coordinate']['longitude'],
+            tuple(time.tzname))
+
+
+def compute_solar_times(location, day):
+    """ Sunrise, solar noon and sunset for a day at the device location
+
+    Args:
+        location (dict): device location from the Mycroft configuration
+        day (date): day to compute
+    Returns:
+        (dict): 'sunrise', 'noon' and 'sunset' datetimes
+    """
+    # Only needed with auto brightness, kept out of the skill load time
+    import astral
+    import arrow
+    from pytz import timezone
+
+    tz = location['timezone']['code']
+    ast_loc = astral.Location()
+    ast_loc.timezone = tz
+    ast_loc.latitude = location['coordinate']['latitude']
+    ast_loc.longitude = location['coordinate']['longitude']
+    sun = ast_loc.sun(date=day)
+
+    midday = datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+    user_set_tz = timezone(tz).localize(midday).strftime('%Z')
+    device_tz = time.tzname
+
+    times = {}
+    for event in ('sunrise', 'noon', 'sunset'):
+        if user_set_tz in device_tz:
+            times[event] = sun[event]
+        else:
+            secs = int(location['timezone']['offset']) / -1000
+            times[event] = arrow.get(sun[event]).shift(
+                seconds=secs).replace(tzinfo='UTC').datetime
+    return times
+
+
+class SolarCache(object):
+    """ Solar event times by location and day
+
+    Each day is computed by astral once and then reused by every brightness
+    event of that day.  Entries for another location, or another timezone
+    setting, are dropped as soon as the location changes.
+
+    Args:
+        max_days (int): number of days kept
+    """
+    def __init__(self, max_days=31):
+        self.max_days = max_days
+        self.computations = 0
+        self._key = None
+        self._days = {}
+        self._lock = Lock()
+
+    def get(self, location, day=None):
+        """ Solar times for a day, computed on first use
+
+        Args:
+            location (dict): device location from the Mycroft configuration
+            day (date): day to look up, defaults to today
+        Returns:
+            (dict): 'sunrise', 'noon' and 'sunset' datetimes
+        """
+        day = day or date.today()
+        key = location_key(location)
+        with self._lock:
+            if key != self._key:
+                self._key = key
+                self._days.clear()
+            if day in self._days:
+                return self._days[day]
+
+        times = compute_solar_times(location, day)
+        with self._lock:
+            if key == self._key:
+                self.computations += 1
+                self._days[day] = times
+                while len(self._days) > self.max_days:
+                    del self._days[min(self._days)]
+        return times
+
+    def prefetch(self, location, days=14):
+        """ Fill the cache for the coming days
+
+        Args:
+            location (dict): device location from the Mycroft configuration
+            days (int): number of days from today
+        """
+        today = date.today()
+        for i in range(min(days, self.max_days)):
+            self.get(location, today + timedelta(days=i))
+
+    def clear(self):
+        with self._lock:
+            self._key = None
+            self._days.clear()
@@ -0,0 +1,248 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import csv
+import hashlib
+import json
+import logging
+import os
+from os.path import abspath, dirname, exists, isdir, join
+
+from .colors import _hex_to_rgb
+
+DIALOG_DIR = join(dirname(abspath(__file__)), 'dialog')
+CACHE_VERSION = 1
+
+# Table name: the .value file it is compiled from
+SOURCES = {
+    'colors': 'colors.value',
+    'brightness': 'brightness.levels.value',
+    'brightness_words': 'brightness.words.value',
+    'color_words': 'colors.words.value'
+}
+
+
+def parse_values(lines, delim=','):
+    """ Same parsing as MycroftSkill.translate_namedvalues()
+
+    Args:
+        lines (iterable): lines of a .value file
+    Returns:
+        (dict): names mapped to values, as strings
+    """
+    result = {}
+    for row in csv.reader(lines, delimiter=delim):
+        if not row or row[0].startswith('#') or len(row) != 2:
+            continue
+        result[row[0]] = row[1]
+    return result
+
+
+def normalize_key(name):
+    # Queries are normalized (lower case) before lookups
+    return ' '.join(name.lower().split())
+
+
+def compile_table(table, values):
+    """ Turn the raw values of a .value file into ready to use data
+
+    Args:
+        table (str): one of SOURCES
+        values (dict): names mapped to values, see parse_values()
+    Returns:
+        (dict): colors give {'hex': {name: code}, 'rgb': {name: [r, g, b]}},
+                brightness gives {name: percent} and the word tables
+                {phrase: meaning}; names are normalized and invalid
+                entries dropped
+    """
+    if table.endswith('_words'):
+        return {normalize_key(phrase): meaning.strip()
+                for phrase, meaning in values.items()}
+    if table == 'colors':
+        codes, rgb = {}, {}
+        for name, code in values.items():
+            name = normalize_key(name)
+            codes.setdefault(name, code.strip())
+            rgb.setdefault(name, _hex_to_rgb(code))
+        return {'hex': codes, 'rgb': rgb}
+
+    levels = {}
+    for name, percent in values.items():
+        try:
+            levels.setdefault(normalize_key(name), int(percent))
+        except ValueError:
+            pass
+    return levels
+
+
+def read_table(lang, table, dialog_dir=DIALOG_DIR):
+    """ Compile one table of one language straight from its .value file
+
+    For when a single table is needed before the cached tables of all
+    languages are loaded.
+
+    Args:
+        lang (str): e.g. 'en-us'
+        table (str): one of SOURCES
+        dialog_dir (str): directory with a folder per language
+    Returns:
+        (dict): see compile_table(), None if the language has no such file
+    """
+    path = join(dialog_dir, lang, SOURCES[table])
+    try:
+        with open(path, encoding='utf-8') as f:
+            values = parse_values(f.read().splitlines())
+    except OSError:
+        return None
+    return compile_table(table, values)
+
+
+def entity_file(directory, name, values):
+    """ Padatious entity file listing values, stored under a content hash
+
+    The same values always give the same file, so it is written only
+    once and Padatious, which keys its training cache on the content,
+    doesn't train again after a restart.  Files of older content are
+    removed.
+
+    Args:
+        directory (str): where the files are kept, e.g. one per language
+        name (str): entity name, e.g. 'color'
+        values (iterable): entity values
+    Returns:
+        (str): path of the entity file
+    """
+    content = ''.join(value + '\n' for value in sorted(set(values)))
+    digest = hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+    filename = '{}.{}.entity'.format(name, digest)
+    path = join(directory, filename)
+    if exists(path):
+        return path
+
+    os.makedirs(directory, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp, path)
+    prefix = name + '.'
+    for old in os.listdir(directory):
+        if old.startswith(prefix) and old.endswith('.entity') and \
+                old != filename:
+            os.remove(join(directory, old))
+    return path
+
+
+def _signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class LocaleTables(object):
+    """ Color and brightness tables of every language, compiled once
+
+    All tables are kept in a single cache file next to the skill settings,
+    one entry per .value file holding its content hash and the compiled
+    table.  Loading takes one read plus a stat of each source; only files
+    whose size or modification time changed are read and hashed, and only
+    files whose content really changed are compiled again.  After loading,
+    a language switch is a dictionary lookup.
+
+    Args:
+        cache_file (str): where the compiled tables are stored, None to
+                          keep them in memory only
+        dialog_dir (str): directory with a folder per language
+        log (Logger): where cache problems are reported
+    """
+    def __init__(self, cache_file=None, dialog_dir=DIALOG_DIR, log=None):
+        self.cache_file = cache_file
+        self.dialog_dir = dialog_dir
+        self.log = log or logging.getLogger(__name__)
+        self.compiled = 0  # files compiled by the last load()
+        self._tables = {}
+
+    def _read_cache(self):
+        if not self.cache_file or not exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+            if cache.get('version') == CACHE_VERSION:
+                return cache['files']
+        except (OSError, ValueError, KeyError):
+            self.log.warning('Ignoring broken table cache {}'.format(
+                self.cache_file))
+        return {}
+
+    def _write_cache(self, files):
+        tmp = self.cache_file + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'version': CACHE_VERSION, 'files': files}, f,
+                          separators=(',', ':'), ensure_ascii=False)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            self.log.exception('Failed to store the table cache')
+
+    def _sources(self):
+        for lang in sorted(os.listdir(self.dialog_dir)):
+            if not isdir(join(self.dialog_dir, lang)):
+                continue
+            for table, filename in SOURCES.items():
+                path = join(self.dialog_dir, lang, filename)
+                if exists(path):
+                    yield lang, table, '{}/{}'.format(lang, filename), path
+
+    def load(self):
+        """ Load every language, compiling what isn't cached
+
+        Returns:
+            (LocaleTables): self, loaded
+        """
+        cached = self._read_cache()
+        files = {}
+        tables = {}
+        self.compiled = 0
+        for lang, table, key, path in self._sources():
+            signature = _signature(path)
+            entry = cached.get(key)
+            if not entry or entry['stat'] != signature:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                digest = hashlib.sha1(content).hexdigest()
+                if not entry or entry['sha1'] != digest:
+                    values = parse_values(
+                        content.decode('utf-8').splitlines())
+                    entry = {'table': compile_table(table, values)}
+                    self.compiled += 1
+                entry = {'stat': signature, 'sha1': digest,
+                         'table': entry['table']}
+            files[key] = entry
+            tables.setdefault(lang, {})[table] = entry['table']
+
+        if self.cache_file and files != cached:
+            self._write_cache(files)
+        self._tables = tables
+        return self
+
+    def languages(self):
+        return sorted(self._tables)
+
+    def get(self, lang, table):
+        """ Compiled table of a language, None if the language has none
+
+        Args:
+            lang (str): e.g. 'en-us'
+            table (str): one of SOURCES
+        """
+        return self._tables.get(lang, {}).get(table)
@@ -0,0 +1,93 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Compare the old parse_brightness() with the BrightnessParser
+
+Checks the parser agrees with the old code on everything the old code
+understood and prints the time per phrase of both, plus what the parser
+makes of relative phrases.  Needs mycroft-core for normalize() and the
+number words.  Run from the skill directory:
+
+    python3 test/benchmark/bench_brightness.py
+"""
+import sys
+import timeit
+
+import harness
+
+PHRASES = ['full', 'half', 'dim', 'auto', '50%', '50 %', '75 percent',
+           '0', '10', '29', '30', '31', '80', '100', '101', 'bogus', '',
+           'fifty', 'twenty five percent']
+RELATIVE = ['brighten it up', 'dim it down a bit', 'a bit brighter',
+            'dim by 20 percent', 'brighter by 5 levels',
+            "you're too bright", 'turn the brightness up to 80 percent',
+            'lower the brightness of your eyes to 20']
+
+
+def legacy_parse_brightness(brightness, brightness_dict):
+    """ parse_brightness() before the BrightnessParser """
+    from mycroft.util.parse import normalize
+    try:
+        name = normalize(brightness)
+        if name in brightness_dict:
+            return brightness_dict[name]
+        if '%' in brightness:
+            brightness = brightness.replace("%", "").strip()
+            return int(brightness)
+        if 'percent' in brightness:
+            brightness = brightness.replace("percent", "").strip()
+            return int(brightness)
+        i = int(brightness)
+        if i < 0 or i > 100:
+            return None
+        if i < 30:
+            return int((i*100.0)/30.0)
+        return i
+    except Exception:
+        return None
+
+
+def main():
+    skill = harness.make_skill('en-us', initialize=False)
+    skill._lang_tables = {}
+    skill._locales = harness.load_skill().Lazy(skill._load_locales)
+    parser = skill.brightness_parser
+    levels = skill.brightness_dict
+
+    for phrase in PHRASES:
+        old = legacy_parse_brightness(phrase, levels)
+        new = parser.parse(phrase).percent
+        if old is not None and int(old) != new:
+            sys.exit('{!r}: old {!r}, new {!r}'.format(phrase, old, new))
+
+    def old():
+        for phrase in PHRASES:
+            legacy_parse_brightness(phrase, levels)
+
+    def new():
+        for phrase in PHRASES:
+            parser.parse(phrase, 15)
+
+    old_time = min(timeit.repeat(old, number=200, repeat=5)) / 200
+    new_time = min(timeit.repeat(new, number=200, repeat=5)) / 200
+    print('old parse_brightness  {:8.2f} us/phrase'.format(
+        old_time / len(PHRASES) * 1e6))
+    print('BrightnessParser      {:8.2f} us/phrase  ({:.1f}x)'.format(
+        new_time / len(PHRASES) * 1e6, old_time / new_time))
+    print('\nfrom level 15 (50%):')
+    for phrase in PHRASES + RELATIVE:
+        print('  {:40} {}'.format(repr(phrase), parser.parse(phrase, 15)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Compare the linear fuzzy_match_color() scan with the ColorIndex
+
+Checks both give the same answer for every locale and prints the time per
+lookup.  Run from the skill directory:
+
+    python3 test/benchmark/bench_fuzzy_color.py
+"""
+import random
+import sys
+import timeit
+from os import listdir
+from os.path import join
+
+from harness import SKILL_DIR, load_helpers, read_values
+
+
+def queries_for(names, rnd):
+    """ Exact names, misheard names and unrelated words """
+    queries = list(names)
+    for name in names:
+        i = rnd.randrange(len(name))
+        queries.append(name[:i] + name[i + 1:])                 # dropped
+        queries.append(name[:i] + rnd.choice('aeiou') + name[i:])  # added
+        queries.append(name + ' color')
+    queries += ['banana', 'what', 'the sky at night', '', 'x']
+    return queries
+
+
+def main():
+    load_helpers()
+    from mark1_helpers.colors import ColorIndex, fuzzy_match_color
+
+    rnd = random.Random(1234)
+    total_linear = total_indexed = 0.0
+    print('{:8} {:>7} {:>12} {:>12} {:>8}'.format(
+        'lang', 'queries', 'linear us', 'indexed us', 'speedup'))
+    for lang in sorted(listdir(join(SKILL_DIR, 'dialog'))):
+        color_dict = read_values(lang, 'colors')
+        index = ColorIndex(color_dict)
+        queries = queries_for(list(color_dict), rnd)
+
+        start = timeit.default_timer()
+        expected = [fuzzy_match_color(q, color_dict) for q in queries]
+        linear = (timeit.default_timer() - start) / len(queries)
+        indexed = min(timeit.repeat(
+            lambda: [index.match(q) for q in queries],
+            number=1, repeat=5)) / len(queries)
+
+        for query, match in zip(queries, expected):
+            found = index.match(query)
+            if found != match:
+                sys.exit('{}: {!r} gave {!r}, expected {!r}'.format(
+                    lang, query, found, match))
+
+        total_linear += linear
+        total_indexed += indexed
+        print('{:8} {:7d} {:12.1f} {:12.1f} {:7.1f}x'.format(
+            lang, len(queries), linear * 1e6, indexed * 1e6,
+            linear / indexed))
+
+    print('all results identical, mean speedup {:.1f}x'.format(
+        total_linear / total_indexed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Time the LED lookup tables and show what they do to colors
+
+Compares dimming a 24 pixel frame by halving every channel with the
+table lookups of LedCurve.  Run from the skill directory:
+
+    python3 test/benchmark/bench_gamma.py
+"""
+import timeit
+
+from harness import load_helpers
+
+COLORS = [(34, 167, 240), (255, 0, 0), (255, 20, 147), (3, 1, 2),
+          (255, 255, 255), (0, 128, 0)]
+
+
+def halve_frame(pixels):
+    # The old _darker_color(), pixel by pixel
+    return [(int(r) // 2, int(g) // 2, int(b) // 2) for r, g, b in pixels]
+
+
+def main():
+    load_helpers()
+    from mark1_helpers.gamma import LedCurve
+
+    build = min(timeit.repeat(lambda: LedCurve().dim_tables(0.5),
+                              number=1, repeat=5))
+    curve = LedCurve()
+    curve.dim_tables(0.5)
+    frame = [COLORS[0]] * 12 + [(0, 0, 0)] * 12
+    rounds = 20000
+    old = min(timeit.repeat(lambda: halve_frame(frame),
+                            number=rounds, repeat=5)) / rounds
+    new = min(timeit.repeat(lambda: curve.dim_frame(frame, 0.5),
+                            number=rounds, repeat=5)) / rounds
+    print('tables for one factor  {:8.1f} us (once)'.format(build * 1e6))
+    print('halve frame            {:8.1f} us'.format(old * 1e6))
+    print('dim_frame              {:8.1f} us ({:.1f}x)'.format(
+        new * 1e6, old / new))
+
+    print('\nhalf as bright, gamma {}:'.format(curve.gamma[0]))
+    for rgb in COLORS:
+        print('  {:16} halved {:16} dimmed {}'.format(
+            str(rgb), str(halve_frame([rgb])[0]), curve.dim(rgb, 0.5)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Micro-benchmarks of the Mark 1 skill's hot paths
+
+Runs the skill against the stand-in bus and enclosure from harness.py and
+reports, for each path, the latency per call and the number of enclosure
+commands it sends.  Results are compared with a saved baseline; a path
+which got slower than the tolerance allows, or sends more commands, is a
+regression and makes the run fail.
+
+    python3 test/benchmark/bench_skill.py          # compare
+    python3 test/benchmark/bench_skill.py --save   # record a new baseline
+
+Needs mycroft-core to be importable, but no running core or hardware.
+"""
+import argparse
+import json
+import sys
+import time
+from os.path import dirname, exists, join
+
+import harness
+
+BASELINE = join(dirname(__file__), 'baseline.json')
+
+COLOR_QUERIES = ['blue', 'dark blue', 'deep pink', 'turquoise', 'lavendr',
+                 'light sea green', 'goldenrod', 'banana', 'ref', 'teal']
+RGB_INPUTS = ['dark blue', 'Deep Pink', '(34, 167, 240)', '#22A7F0',
+              '22a7f0', 'not a color', '(300, 0, 0)']
+BRIGHTNESS_INPUTS = ['full', 'half', '50%', '75 percent', '20', '80',
+                     'dim', 'auto', 'bogus']
+
+
+class Result(object):
+    def __init__(self, name, samples, commands, calls):
+        samples = sorted(samples)
+        self.name = name
+        self.calls = calls
+        self.mean_us = sum(samples) / len(samples) * 1e6
+        self.p95_us = samples[int(len(samples) * 0.95)] * 1e6
+        self.commands = float(commands) / calls
+
+    def as_dict(self):
+        return {'mean_us': round(self.mean_us, 2),
+                'p95_us': round(self.p95_us, 2),
+                'commands': round(self.commands, 3)}
+
+
+def measure(skill, name, calls, setup=None, settle=None):
+    """ Time calls, counting the enclosure commands they send
+
+    Args:
+        skill (Mark1): skill built by harness.make_skill()
+        name (str): path name for the report
+        calls (list): callables, each one call of the path
+        setup (callable): run untimed before each call
+        settle (callable): run untimed after each call, e.g. to let
+                           queued animations play out
+    """
+    samples = []
+    commands = 0
+    for call in calls:
+        if setup:
+            setup()
+        before = len(skill.enclosure.commands)
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+        if settle:
+            settle()
+        commands += len(skill.enclosure.commands) - before
+    return Result(name, samples, commands, len(calls))
+
+
+def repeat(func, args, rounds):
+    return [lambda a=a: func(*a) for a in args] * rounds
+
+
+def bench_colors(skill, rounds):
+    from mycroft.messagebus.message import Message
+    from mycroft.util.parse import normalize
+
+    fuzzy_match_color = harness.load_skill().colors.fuzzy_match_color
+    color_dict = skill.color_dict
+    yield measure(skill, 'fuzzy_match_color (linear scan)',
+                  repeat(fuzzy_match_color,
+                         [(q, color_dict) for q in COLOR_QUERIES],
+                         max(1, rounds // 10)))
+    yield measure(skill, 'color_index.match',
+                  repeat(skill.color_index.match,
+                         [(normalize(q),) for q in COLOR_QUERIES], rounds))
+    yield measure(skill, 'handle_eye_color',
+                  repeat(skill.handle_eye_color,
+                         [(Message('', {'color': q}),)
+                          for q in COLOR_QUERIES], rounds),
+                  settle=lambda: skill.animator.wait(5))
+    yield measure(skill, '_parse_to_rgb',
+                  repeat(skill._parse_to_rgb,
+                         [(c,) for c in RGB_INPUTS], rounds))
+
+
+def bench_brightness(skill, rounds):
+    yield measure(skill, 'parse_brightness',
+                  repeat(skill.parse_brightness,
+                         [(b,) for b in BRIGHTNESS_INPUTS], rounds))
+    try:
+        skill._brightness_curve()
+    except ImportError as e:
+        print('skipping auto brightness, {}'.format(e))
+        return
+    yield measure(skill, 'auto brightness curve level',
+                  [lambda: skill._brightness_curve().level(time.time())] *
+                  rounds)
+
+
+def bench_idle(skill, rounds):
+    skill.settings['auto_dim_eyes'] = True
+
+    def idle_for(seconds, idle_count):
+        def setup():
+            skill._stop_idle_check()
+            skill._last_activity = time.monotonic() - seconds
+            skill.idle_count = idle_count
+        return setup
+
+    def settle():
+        # The check and visuals run on the animator thread, count their
+        # commands too
+        skill.animator.wait(5)
+        skill._stop_idle_check()
+
+    # Stages hold the eyes for a moment, a few rounds are plenty
+    few = max(1, rounds // 100)
+    yield measure(skill, 'check_for_idle (lower eyes)',
+                  [skill.check_for_idle] * few,
+                  setup=idle_for(3600, 0), settle=settle)
+    yield measure(skill, 'check_for_idle (inattentive)',
+                  [skill.check_for_idle] * few,
+                  setup=idle_for(3600, 2), settle=settle)
+    yield measure(skill, 'check_for_idle (active)',
+                  [skill.check_for_idle] * rounds,
+                  setup=idle_for(0, 0), settle=settle)
+
+
+def bench_busy(skill, rounds):
+    from mycroft.messagebus.message import Message
+
+    start = Message('mycroft.skill.handler.start',
+                    {'name': 'WeatherSkill.handle_current_weather'})
+    complete = Message('mycroft.skill.handler.complete',
+                       {'name': 'WeatherSkill.handle_current_weather'})
+    ignored = Message('mycroft.skill.handler.start',
+                      {'name': 'TimeSkill.update_display'})
+
+    def settle():
+        skill.animator.wait(5)
+
+    yield measure(skill, 'on_handler_started',
+                  [lambda: skill.on_handler_started(start)] * rounds,
+                  settle=lambda: (settle(),
+                                  skill.on_handler_complete(complete),
+                                  settle()))
+    yield measure(skill, 'on_handler_complete',
+                  [lambda: skill.on_handler_complete(complete)] * rounds,
+                  setup=lambda: (skill.on_handler_started(start), settle()),
+                  settle=settle)
+    yield measure(skill, 'on_handler_started (ignored)',
+                  [lambda: skill.on_handler_started(ignored)] * rounds)
+
+
+BENCHMARKS = [bench_colors, bench_brightness, bench_idle, bench_busy]
+
+
+def compare(results, baseline, tolerance):
+    """ Names of regressed paths, printing a report """
+    regressions = []
+    print('{:34} {:>10} {:>10} {:>9} {:>10}'.format(
+        'path', 'mean us', 'p95 us', 'commands', 'baseline'))
+    for result in results:
+        base = baseline.get(result.name)
+        note = ''
+        if base:
+            note = '{:.1f}us'.format(base['mean_us'])
+            if (result.mean_us > base['mean_us'] * (1 + tolerance) or
+                    result.commands > base['commands']):
+                regressions.append(result.name)
+                note += ' REGRESSED'
+        print('{:34} {:10.1f} {:10.1f} {:9.2f} {:>10}'.format(
+            result.name, result.mean_us, result.p95_us, result.commands,
+            note))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--lang', default='en-us')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed slowdown, 0.5 is 50%%')
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the new baseline')
+    args = parser.parse_args()
+
+    skill = harness.make_skill(args.lang)
+    try:
+        results = []
+        for bench in BENCHMARKS:
+            results += list(bench(skill, args.rounds))
+    finally:
+        skill.shutdown()
+
+    baseline = {}
+    if exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({r.name: r.as_dict() for r in results}, f,
+                      indent=2, sort_keys=True)
+        print('baseline saved to {}'.format(args.baseline))
+    elif regressions:
+        sys.exit('regressions: {}'.format(', '.join(regressions)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Compare parsing the .value files with the compiled table cache
+
+Prints the time to parse one language the way translate_namedvalues()
+does, to build the cache of every language from scratch, to load it
+again and to switch language once loaded.  Run from the skill directory:
+
+    python3 test/benchmark/bench_tables.py
+"""
+import tempfile
+import timeit
+from os.path import join
+
+from harness import load_helpers, read_values
+
+
+def main():
+    load_helpers()
+    from mark1_helpers.tables import LocaleTables
+
+    cache_file = join(tempfile.mkdtemp(prefix='mark1-tables-'),
+                      'tables.json')
+
+    def parse():
+        read_values('en-us', 'colors')
+        read_values('en-us', 'brightness.levels')
+
+    def cold():
+        LocaleTables().load()
+
+    parse_time = min(timeit.repeat(parse, number=1, repeat=20))
+    cold_time = min(timeit.repeat(cold, number=1, repeat=5))
+    tables = LocaleTables(cache_file).load()
+    warm_time = min(timeit.repeat(lambda: LocaleTables(cache_file).load(),
+                                  number=1, repeat=20))
+    langs = tables.languages()
+    switch_time = min(timeit.repeat(
+        lambda: [tables.get(lang, 'colors') for lang in langs],
+        number=100, repeat=5)) / 100 / len(langs)
+
+    print('parse en-us .value files        {:9.2f} ms'.format(
+        parse_time * 1000))
+    print('compile all {} languages        {:9.2f} ms'.format(
+        len(langs), cold_time * 1000))
+    print('load all from the cache         {:9.2f} ms  ({} compiled)'.format(
+        warm_time * 1000, LocaleTables(cache_file).load().compiled))
+    print('switch language                 {:9.2f} us'.format(
+        switch_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Stand-ins for running the Mark 1 skill without a device
+
+Provides a bus and an enclosure which record everything instead of
+talking to mycroft-core services, and builds a Mark1 instance wired to
+them.  The skill itself still needs mycroft-core to be importable; the
+helper modules (colors, eyes, timers...) only need load_helpers().
+"""
+import csv
+import importlib.util
+import logging
+import sys
+import tempfile
+import types
+from collections import defaultdict
+from os.path import abspath, dirname, join
+from unittest import mock
+
+SKILL_DIR = dirname(dirname(dirname(abspath(__file__))))
+HELPERS = 'mark1_helpers'
+SKILL = 'mark1_skill'
+
+# Bus messages the real EnclosureAPI sends, and the names of their data
+ENCLOSURE_MESSAGES = {
+    'eyes_color': ('enclosure.eyes.color', ('r', 'g', 'b')),
+    'eyes_setpixel': ('enclosure.eyes.setpixel', ('idx', 'r', 'g', 'b')),
+    'eyes_brightness': ('enclosure.eyes.level', ('level',)),
+    'eyes_look': ('enclosure.eyes.look', ('side',)),
+    'eyes_blink': ('enclosure.eyes.blink', ('side',)),
+    'reset': ('enclosure.reset', ()),
+    'mouth_reset': ('enclosure.mouth.reset', ()),
+    'mouth_think': ('enclosure.mouth.think', ())
+}
+
+
+def load_helpers():
+    """ Make the skill's helper modules importable without mycroft-core
+
+    Returns:
+        (module): package, e.g. load_helpers().colors after importing
+                  mark1_helpers.colors
+    """
+    if HELPERS not in sys.modules:
+        package = types.ModuleType(HELPERS)
+        package.__path__ = [SKILL_DIR]
+        sys.modules[HELPERS] = package
+    return sys.modules[HELPERS]
+
+
+def load_skill():
+    """ Import the skill itself, needs mycroft-core """
+    if SKILL not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            SKILL, join(SKILL_DIR, '__init__.py'),
+            submodule_search_locations=[SKILL_DIR])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[SKILL] = module
+        spec.loader.exec_module(module)
+    return sys.modules[SKILL]
+
+
+def read_values(lang, name):
+    """ Same parsing as MycroftSkill.translate_namedvalues() """
+    result = {}
+    with open(join(SKILL_DIR, 'dialog', lang, name + '.value')) as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith('#') or len(row) != 2:
+                continue
+            result[row[0]] = row[1]
+    return result
+
+
+class FakeBus(object):
+    """ Messagebus delivering every message synchronously """
+    def __init__(self):
+        self.handlers = defaultdict(list)
+        self.emitted = []
+
+    def on(self, msg_type, handler):
+        self.handlers[msg_type].append(handler)
+
+    def once(self, msg_type, handler):
+        self.on(msg_type, handler)
+
+    def remove(self, msg_type, handler):
+        if handler in self.handlers[msg_type]:
+            self.handlers[msg_type].remove(handler)
+
+    def remove_all_listeners(self, msg_type):
+        self.handlers.pop(msg_type, None)
+
+    def emit(self, message):
+        self.emitted.append(message)
+        for handler in list(self.handlers[message.msg_type]):
+            handler(message)
+
+
+class FakeDisplayManager(object):
+    def __init__(self):
+        self.active = ''
+
+    def get_active(self):
+        return self.active
+
+
+class FakeEnclosure(object):
+    """ Records enclosure calls and echoes them on the bus like the real one
+
+    Args:
+        bus (FakeBus): where the enclosure messages are sent
+        message_class (type): mycroft Message
+    """
+    def __init__(self, bus, message_class):
+        self.bus = bus
+        self.message_class = message_class
+        self.display_manager = FakeDisplayManager()
+        self.commands = []
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            if name in ENCLOSURE_MESSAGES:
+                msg_type, keys = ENCLOSURE_MESSAGES[name]
+                data = dict(zip(keys, args))
+                data.update(kwargs)
+                self.bus.emit(self.message_class(msg_type, data))
+        return command
+
+
+class FakeConfiguration(object):
+    config = {'confirm_listening': True}
+
+    @classmethod
+    def get(cls, *args, **kwargs):
+        return cls.config
+
+
+LOCATION = {
+    'coordinate': {'latitude': 37.2, 'longitude': -121.5},
+    'timezone': {'code': 'America/Los_Angeles', 'offset': -28800000}
+}
+
+
+def _skill_base_init(self, name=None, bus=None, use_settings=True):
+    """ Replaces MycroftSkill.__init__, which needs a running core """
+    self.name = name
+    self.settings = {}
+    self.log = logging.getLogger(name)
+    self.file_system = types.SimpleNamespace(
+        path=tempfile.mkdtemp(prefix='mark1-bench-'))
+
+
+def make_skill(lang='en-us', initialize=True):
+    """ Build a Mark1 skill wired to a FakeBus and FakeEnclosure
+
+    Returns:
+        (Mark1): skill, with .bus and .enclosure being the fakes
+    """
+    module = load_skill()
+    from mycroft.messagebus.message import Message
+
+    class BenchMark1(module.Mark1):
+        # Plain attributes shadow the MycroftSkill properties
+        bus = None
+        enclosure = None
+        lang = None
+        location = None
+        skill_id = 'mark1'
+
+        def translate_namedvalues(self, name, delim=','):
+            return read_values(self.lang, name)
+
+        def add_event(self, name, handler, *args, **kwargs):
+            self.bus.on(name, handler)
+
+        def speak_dialog(self, key, data=None, *args, **kwargs):
+            self.spoken.append((key, data))
+
+        def get_response(self, *args, **kwargs):
+            return None
+
+    with mock.patch.object(module.MycroftSkill, '__init__',
+                           _skill_base_init):
+        skill = BenchMark1()
+    skill.spoken = []
+    skill.lang = lang
+    skill.location = LOCATION
+    skill.bus = FakeBus()
+    skill.enclosure = FakeEnclosure(skill.bus, Message)
+    if initialize:
+        with mock.patch.object(module, 'Configuration', FakeConfiguration):
+            skill.initialize()
+        # Count commands, don't wait for the serial link
+        skill.eyes.governor = module.eyes.SerialGovernor(rate=1e12,
+                                                         burst=1e12)
+    return skill
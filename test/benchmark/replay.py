@@ -0,0 +1,529 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Replay messagebus traffic against the Mark 1 skill on a virtual clock
+
+The skill runs single threaded: its timers, the eye animations and the
+serial link pacing all follow a virtual clock which jumps from one event
+to the next, so hours of traffic replay in seconds and every run of the
+same trace sends the same enclosure commands.
+
+Traces are JSON lines, one message each, with the time in seconds from
+the start of the trace:
+
+    {"t": 0.5, "type": "mycroft.skill.handler.start",
+     "data": {"name": "WeatherSkill.handle_current_weather"}}
+
+or generated (--synthetic storm|wake|mixed).  The report lists
+throughput, how long the bus callbacks blocked and sequencing problems:
+an hourglass left showing, an hourglass with nothing running, a wake-up
+which didn't wake the eyes, eyes dozing off while the device was in use
+and lowered eyes opened again by an eyes_color.
+
+    python3 test/benchmark/replay.py --synthetic storm --rate 2000
+    python3 test/benchmark/replay.py --trace my.jsonl --commands out.jsonl
+"""
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import random
+import sys
+import time
+import types
+from collections import Counter
+from unittest import mock
+
+import harness
+
+# Messages which show the device is in use, see Mark1._note_activity()
+ACTIVITY = ('mycroft.skill.handler.start', 'mycroft.skill.handler.complete',
+            'recognizer_loop:record_begin',
+            'recognizer_loop:audio_output_start', 'enclosure.mouth.text',
+            'enclosure.mouth.events.deactivate')
+SETTLE = 120  # seconds replayed after the last message
+
+
+class VirtualClock(object):
+    """ Time which only moves when told to
+
+    Args:
+        epoch (float): wall clock time at the start of the trace
+    """
+    def __init__(self, epoch=1500000000.0):
+        self.now = 0.0
+        self.epoch = epoch
+        self.blocked = 0.0
+        self.max_blocked = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.epoch + self.now
+
+    def sleep(self, seconds):
+        """ The caller blocks, e.g. waiting for the serial link """
+        self.now += seconds
+        self.blocked += seconds
+        self.max_blocked = max(self.max_blocked, seconds)
+
+    def advance(self, t):
+        self.now = max(self.now, t)
+
+    def module(self):
+        """ Stand-in for the time module """
+        return types.SimpleNamespace(monotonic=self.monotonic,
+                                     time=self.time, sleep=self.sleep)
+
+
+def sim_timers(module, clock):
+    """ TimerQueue run by the replay loop instead of a thread """
+    class SimTimers(module.timers.TimerQueue):
+        def stop(self):
+            self._heap = []
+
+    def factory(name=None, log=None, metrics=None):
+        return SimTimers(clock.monotonic, log, metrics)
+    return factory
+
+
+class SimAnimator(object):
+    """ Plays timelines on the skill's timers instead of a thread
+
+    Mirrors Animator: timelines play by priority, preempting lower ones,
+    late frames of a transition are skipped and submitted tasks run in
+    order (at once, the replay is the only thread).
+    """
+    def __init__(self, framebuffer, timers, clock, apply_step, fps=10):
+        self.framebuffer = framebuffer
+        self.timers = timers
+        self.clock = clock
+        self.apply_step = apply_step
+        self.fps = fps
+        self.played = 0
+        self.preempted = 0
+        self.skipped = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._playing = None
+        self._program = None
+        self._on_done = None
+        self._timer = None
+
+    def play(self, timeline, priority=0, interrupt=False, done=None):
+        if interrupt:
+            dropped, self._queue = self._queue, []
+        else:
+            dropped = [e for e in self._queue if -e[0] < priority]
+            self._queue = [e for e in self._queue if -e[0] >= priority]
+            heapq.heapify(self._queue)
+        for entry in dropped:
+            self._done(entry[3], False)
+        heapq.heappush(self._queue, (-priority, next(self._seq), timeline,
+                                     done))
+        if self._playing is not None and (interrupt or
+                                          self._playing < priority):
+            self.preempted += 1
+            self._stop_playing()
+        if self._playing is None:
+            self._next()
+
+    @staticmethod
+    def _done(done, played):
+        if done is not None:
+            done(played)
+
+    def submit(self, func, *args):
+        func(*args)
+
+    def cancel(self):
+        dropped, self._queue = self._queue, []
+        for entry in dropped:
+            self._done(entry[3], False)
+        self._stop_playing()
+
+    def wait(self, timeout=None):
+        return True
+
+    def stop(self):
+        self.cancel()
+
+    def _stop_playing(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._program is not None:
+            self._done(self._on_done, False)
+        self._playing = self._program = self._on_done = None
+
+    def _next(self):
+        self._timer = None
+        self._playing = self._program = None
+        if not self._queue:
+            return
+        priority, _, timeline, self._on_done = heapq.heappop(self._queue)
+        self._playing = -priority
+        self._program = timeline.compile(self.framebuffer.current(), self.fps)
+        self._index = 0
+        self._start = self.clock.monotonic()
+        self._duration = timeline.duration()
+        self._step()
+
+    def _step(self):
+        self._timer = None
+        program = self._program
+        while self._index < len(program):
+            offset, kind, payload, final = program[self._index]
+            elapsed = self.clock.monotonic() - self._start
+            if offset > elapsed:
+                self._timer = self.timers.schedule(offset - elapsed,
+                                                   self._step)
+                return
+            self._index += 1
+            if (not final and self._index < len(program) and
+                    program[self._index][0] <= elapsed):
+                self.skipped += 1
+                continue
+            self.apply_step(self.framebuffer, kind, payload)
+            if self._program is not program:
+                return  # preempted by what the step triggered
+        self.played += 1
+        done, self._on_done = self._on_done, None
+        self._done(done, True)
+        remaining = self._start + self._duration - self.clock.monotonic()
+        self._timer = self.timers.schedule(max(0, remaining), self._next)
+
+
+def make_sim_skill(clock, lang='en-us'):
+    """ Mark1 on FakeBus/FakeEnclosure with everything on the clock
+
+    The skill module keeps reading the clock until shutdown, the caller
+    stops skill.time_patch afterwards.
+    """
+    module = harness.load_skill()
+    skill = harness.make_skill(lang, initialize=False)
+    skill.time_patch = mock.patch.object(module, 'time', clock.module())
+    skill.time_patch.start()
+    with mock.patch.object(module, 'Configuration',
+                           harness.FakeConfiguration), \
+            mock.patch.object(module, 'TimerThread',
+                              sim_timers(module, clock)):
+        skill.initialize()
+    # One virtual thread runs the timers and the background jobs
+    skill.background = skill.timers
+    skill.animator.stop()
+    skill.animator = SimAnimator(skill.eyes, skill.timers, clock,
+                                 module.animation.apply_step)
+    skill.eyes.governor = module.eyes.SerialGovernor(
+        clock=clock.monotonic, sleep=clock.sleep)
+    skill.hourglass_info.clock = clock.monotonic
+    skill._last_activity = clock.monotonic()
+    return skill
+
+
+#####################################################################
+# Traces
+
+def event(t, msg_type, **data):
+    return {'t': round(t, 6), 'type': msg_type, 'data': data}
+
+
+def storm_trace(rnd, rate=1000, duration=10, lost=0.0, start=0.0):
+    """ Overlapping handler start/complete pairs at rate pairs a second
+
+    Most handlers are quick, some take long enough for the hourglass and
+    some speak while running.  lost is the fraction of handlers whose
+    complete message never arrives.
+    """
+    events = []
+    skills = ['WeatherSkill.handle_current_weather',
+              'WikipediaSkill.handle_wiki_query', 'TimerSkill.handle_start',
+              'TimeSkill.update_display', 'VolumeSkill.handle_volume',
+              'NewsSkill.handle_news', 'JokeSkill.handle_joke']
+    for i in range(int(rate * duration)):
+        t = start + i / float(rate)
+        name = '{}_{}'.format(rnd.choice(skills), i)
+        events.append(event(t, 'mycroft.skill.handler.start', name=name))
+        length = rnd.choice([0.01, 0.05, 0.1, 0.3, 1.5, 4.0])
+        if length > 0.2 and rnd.random() < 0.4:
+            events.append(event(t + length / 3,
+                                'recognizer_loop:audio_output_start'))
+        if rnd.random() >= lost:
+            events.append(event(t + length,
+                                'mycroft.skill.handler.complete', name=name))
+    return events
+
+
+def wake_trace(rnd, cycles=50, start=0.0):
+    """ Long quiet periods, each ended by the wake word and a question """
+    events = []
+    t = start
+    for _ in range(cycles):
+        t += rnd.choice([5, 13, 17, 25, 40, 90])
+        events.append(event(t, 'recognizer_loop:record_begin'))
+        events.append(event(t + 2, 'recognizer_loop:record_end'))
+        name = 'WeatherSkill.handle_current_weather'
+        events.append(event(t + 2.5, 'mycroft.skill.handler.start',
+                            name=name))
+        events.append(event(t + 3, 'recognizer_loop:audio_output_start'))
+        events.append(event(t + 3.5, 'mycroft.skill.handler.complete',
+                            name=name))
+        t += 3.5
+    return events
+
+
+def synthetic(kind, seed, rate, duration, lost):
+    rnd = random.Random(seed)
+    events = [event(0, 'mycroft.ready')]
+    if kind == 'storm':
+        events += storm_trace(rnd, rate, duration, lost, start=1)
+    elif kind == 'wake':
+        events += wake_trace(rnd)
+    else:
+        events += wake_trace(rnd)
+        events += storm_trace(rnd, rate, duration, lost,
+                              start=events[-1]['t'] / 2)
+    return events
+
+
+def load_trace(path):
+    """ Read a JSON lines trace, 'time' is accepted for 't' """
+    events = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                msg = json.loads(line)
+                events.append({'t': float(msg.get('t', msg.get('time'))),
+                               'type': msg['type'],
+                               'data': msg.get('data') or {}})
+    return events
+
+
+#####################################################################
+# Replay
+
+class Replay(object):
+    """ Feed a trace to a skill and check what ends up on the faceplate
+
+    Args:
+        events (list): trace, see event()
+        lang (str): skill language
+    """
+    def __init__(self, events, lang='en-us'):
+        # Stable sort, messages at the same time keep their trace order
+        self.events = sorted(events, key=lambda e: e['t'])
+        self.clock = VirtualClock()
+        self.skill = make_sim_skill(self.clock, lang)
+        from mycroft.messagebus.message import Message
+        self.message_class = Message
+        self.stamps = []         # virtual time of each enclosure command
+        self.blocking = []       # wall time of each bus message
+        self.problems = Counter()
+        self.examples = {}
+        self.running = set()     # handlers started, not completed
+        self.last_activity = 0.0
+
+    def _problem(self, kind, detail):
+        self.problems[kind] += 1
+        self.examples.setdefault(
+            kind, '{:.3f}s {}'.format(self.clock.now, detail))
+
+    def _new_commands(self, before):
+        sent = self.skill.enclosure.commands
+        commands = sent[before:]
+        self.stamps += [self.clock.now] * len(commands)
+        previous = sent[before - 1] if before else None
+        for name, args, kwargs in commands:
+            if (name == 'eyes_color' and previous is not None and
+                    previous[:2] == ('eyes_look', ('d',))):
+                self._problem('lowered eyes reopened', name)
+            previous = (name, args, kwargs)
+            if name == 'mouth_think' and not self.running:
+                self._problem('hourglass with nothing running', name)
+            if name == 'eyes_look' and args == ('d',):
+                idle = self.clock.now - self.last_activity
+                if idle < self.skill.IDLE_LOWER_DELAY:
+                    self._problem('dozed off while active',
+                                  'idle for {:.1f}s'.format(idle))
+        return commands
+
+    def _run_timers(self, until):
+        timers = self.skill.timers
+        while True:
+            deadline = timers.next_deadline()
+            if deadline is None or deadline > until:
+                break
+            self.clock.advance(deadline)
+            before = len(self.skill.enclosure.commands)
+            timers.run_due(self.clock.now)
+            self._new_commands(before)
+        self.clock.advance(until)
+
+    def _emit(self, msg):
+        skill = self.skill
+        msg_type, data = msg['type'], msg['data']
+        name = data.get('name', '')
+        ignored = skill.hourglass_info.is_ignored(name)
+        if msg_type in ACTIVITY and not (name and ignored):
+            self.last_activity = self.clock.now
+        if msg_type == 'mycroft.skill.handler.start' and not ignored:
+            self.running.add(name)
+        elif msg_type == 'mycroft.skill.handler.complete':
+            self.running.discard(name)
+
+        asleep = skill.idle_count > 2
+        before = len(skill.enclosure.commands)
+        start = time.perf_counter()
+        skill.bus.emit(self.message_class(msg_type, data))
+        self.blocking.append(time.perf_counter() - start)
+        commands = self._new_commands(before)
+        if (msg_type == 'recognizer_loop:record_begin' and asleep and
+                skill.settings['auto_dim_eyes'] and
+                not any(c[0] == 'eyes_blink' for c in commands)):
+            self._problem('missed wake-up', 'eyes stayed asleep')
+
+    def run(self):
+        """ Replay the trace, then let the skill settle
+
+        Returns:
+            (dict): the report
+        """
+        wall = time.perf_counter()
+        try:
+            for msg in self.events:
+                self._run_timers(msg['t'])
+                self._emit(msg)
+            end = self.events[-1]['t'] if self.events else 0.0
+            self._run_timers(end + SETTLE)
+        finally:
+            wall = time.perf_counter() - wall
+            self.skill.time_patch.stop()
+
+        commands = self.skill.enclosure.commands
+        last_think = last_reset = -1
+        for i, (name, args, kwargs) in enumerate(commands):
+            if name == 'mouth_think':
+                last_think = i
+            elif name == 'reset':
+                last_reset = i
+        if last_think > last_reset:
+            self._problem('hourglass left showing',
+                          '{} handlers never completed'.format(
+                              len(self.running)))
+        self.skill.shutdown()
+        return self.report(wall, end)
+
+    def command_stream(self):
+        for stamp, (name, args, kwargs) in zip(self.stamps,
+                                               self.skill.enclosure.commands):
+            yield {'t': round(stamp, 6), 'command': name, 'args': args,
+                   'kwargs': kwargs}
+
+    def report(self, wall, duration):
+        blocking = sorted(self.blocking) or [0.0]
+        stream = json.dumps(list(self.command_stream()), sort_keys=True)
+        commands = self.skill.enclosure.commands
+        return {
+            'messages': len(self.events),
+            'trace_seconds': round(duration, 3),
+            'replay_seconds': round(wall, 3),
+            'messages_per_second': round(len(self.events) / wall, 1)
+            if wall else None,
+            'bus_blocking_ms': {
+                'total': round(sum(blocking) * 1000, 3),
+                'mean': round(sum(blocking) / len(blocking) * 1000, 4),
+                'p99': round(blocking[int(len(blocking) * 0.99)] * 1000, 4),
+                'max': round(blocking[-1] * 1000, 4)
+            },
+            'serial_wait_ms': {
+                'total': round(self.clock.blocked * 1000, 3),
+                'max': round(self.clock.max_blocked * 1000, 3)
+            },
+            'enclosure_commands': len(commands),
+            'commands_by_type': dict(Counter(c[0] for c in commands)),
+            'command_stream_sha1': hashlib.sha1(
+                stream.encode('utf-8')).hexdigest(),
+            'problems': dict(self.problems),
+            'examples': self.examples
+        }
+
+
+def print_report(report):
+    print('{messages} messages over {trace_seconds}s of trace, replayed '
+          'in {replay_seconds}s ({messages_per_second} msg/s)'.format(
+              **report))
+    print('bus blocking ms: total {total} mean {mean} p99 {p99} '
+          'max {max}'.format(**report['bus_blocking_ms']))
+    print('serial wait ms: total {total} max {max}'.format(
+        **report['serial_wait_ms']))
+    print('{} enclosure commands: {}'.format(
+        report['enclosure_commands'],
+        ', '.join('{} {}'.format(k, v) for k, v in
+                  sorted(report['commands_by_type'].items()))))
+    print('command stream sha1 {}'.format(report['command_stream_sha1']))
+    if not report['problems']:
+        print('no sequencing problems')
+    for kind, n in sorted(report['problems'].items()):
+        print('PROBLEM {} x{}, first at {}'.format(kind, n,
+                                                   report['examples'][kind]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--trace', help='JSON lines trace to replay')
+    source.add_argument('--synthetic', default='mixed',
+                        choices=['storm', 'wake', 'mixed'])
+    parser.add_argument('--rate', type=float, default=1000,
+                        help='handler pairs a second in a storm')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='seconds of storm')
+    parser.add_argument('--lost', type=float, default=0.0,
+                        help='fraction of handlers never completing')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--lang', default='en-us')
+    parser.add_argument('--commands', help='write the command stream here')
+    parser.add_argument('--save-trace', help='write the trace here')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    args = parser.parse_args()
+
+    if args.trace:
+        events = load_trace(args.trace)
+    else:
+        events = synthetic(args.synthetic, args.seed, args.rate,
+                           args.duration, args.lost)
+    if args.save_trace:
+        with open(args.save_trace, 'w') as f:
+            for msg in events:
+                f.write(json.dumps(msg, sort_keys=True) + '\n')
+
+    replay = Replay(events, args.lang)
+    report = replay.run()
+    if args.commands:
+        with open(args.commands, 'w') as f:
+            for command in replay.command_stream():
+                f.write(json.dumps(command, sort_keys=True) + '\n')
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print_report(report)
+    if report['problems']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
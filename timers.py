@@ -0,0 +1,157 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import logging
+import time
+from itertools import count
+from threading import Condition, Thread
+
+
+class Timer(object):
+    """ Handle for a callback scheduled on a TimerQueue """
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """ Prevent the callback from running, if it hasn't already """
+        self.cancelled = True
+
+
+class TimerQueue(object):
+    """ Heap of pending timers, ordered by deadline
+
+    The queue doesn't run anything by itself, run_due() is called with the
+    current time by a TimerThread or, in tests, by a simulated clock.
+
+    Args:
+        clock (callable): monotonic time source
+        log (Logger): where failing callbacks are reported
+        metrics (Metrics): where callback durations and lag are recorded
+    """
+    def __init__(self, clock=time.monotonic, log=None, metrics=None):
+        self.clock = clock
+        self.log = log or logging.getLogger(__name__)
+        self.metrics = metrics
+        self._heap = []
+        self._seq = count()
+
+    def schedule(self, delay, callback, *args):
+        """ Run callback(*args) after delay seconds
+
+        Returns:
+            (Timer): handle which can be cancelled
+        """
+        timer = Timer(self.clock() + delay, callback, args)
+        heapq.heappush(self._heap, (timer.deadline, next(self._seq), timer))
+        return timer
+
+    def next_deadline(self):
+        """ Deadline of the earliest live timer, or None """
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """ Remove and return the timers due at time now, in order """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            timer = heapq.heappop(self._heap)[2]
+            if not timer.cancelled:
+                due.append(timer)
+        return due
+
+    def run_due(self, now):
+        """ Run every timer due at time now
+
+        Returns:
+            (int): number of callbacks run
+        """
+        due = self.pop_due(now)
+        for timer in due:
+            self.fire(timer)
+        return len(due)
+
+    def fire(self, timer):
+        if timer.cancelled:
+            return
+        timer.cancelled = True  # a timer only runs once
+        name = getattr(timer.callback, '__name__', timer.callback)
+        if self.metrics:
+            start = self.metrics.clock()
+            self.metrics.observe('timer.lag',
+                                 max(0.0, self.clock() - timer.deadline))
+        try:
+            timer.callback(*timer.args)
+        except Exception:
+            self.log.exception('Timer callback {} failed'.format(name))
+        if self.metrics:
+            self.metrics.observe('timer.{}'.format(name),
+                                 self.metrics.clock() - start)
+
+    def __len__(self):
+        return sum(1 for entry in self._heap if not entry[2].cancelled)
+
+
+class TimerThread(TimerQueue):
+    """ TimerQueue run by a single background thread
+
+    Replaces sleeping in messagebus callbacks; the callback schedules the
+    delayed work here and returns immediately.  All timers share one
+    thread, so callbacks should be short.
+    """
+    def __init__(self, name='Mark1Timers', clock=time.monotonic, log=None,
+                 metrics=None):
+        super(TimerThread, self).__init__(clock, log, metrics)
+        self._wakeup = Condition()
+        self._running = True
+        self._thread = Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def schedule(self, delay, callback, *args):
+        with self._wakeup:
+            timer = super(TimerThread, self).schedule(delay, callback, *args)
+            self._wakeup.notify()
+        return timer
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                if not self._running:
+                    return
+                deadline = self.next_deadline()
+                now = self.clock()
+                if deadline is None:
+                    self._wakeup.wait()
+                    continue
+                if deadline > now:
+                    self._wakeup.wait(deadline - now)
+                    continue
+                due = self.pop_due(now)
+            for timer in due:
+                self.fire(timer)
+
+    def stop(self):
+        """ Stop the thread, pending timers are dropped """
+        with self._wakeup:
+            self._running = False
+            self._heap = []
+            self._wakeup.notify()
+        self._thread.join(1.0)
@@ -0,0 +1,78 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from threading import Lock
+
+
+class WriteBehind(object):
+    """ Coalesces changes and stores them once things are quiet
+
+    Changes are merged in memory and handed to the store function in one
+    go, delay seconds after the last change, from the timer thread.  The
+    caller never waits for the disk.  With max_delay, changes that keep
+    coming are still written that long after the first of them.
+
+    Args:
+        store (callable): called with a dict of all pending changes
+        timers (TimerQueue): where the delayed write runs
+        delay (float): quiet period before writing
+        max_delay (float): longest a change waits, None for no limit
+        log (Logger): where failing writes are reported
+    """
+    def __init__(self, store, timers, delay=2.0, max_delay=None, log=None):
+        self.store = store
+        self.timers = timers
+        self.delay = delay
+        self.max_delay = max_delay
+        self.log = log or logging.getLogger(__name__)
+        self.writes = 0
+        self._pending = {}
+        self._timer = None
+        self._deadline = None  # when the oldest pending change is due
+        self._lock = Lock()
+
+    def update(self, changes):
+        """ Queue changes, later values for a key replace earlier ones """
+        with self._lock:
+            self._pending.update(changes)
+            if self._timer:
+                self._timer.cancel()
+            delay = self.delay
+            if self.max_delay is not None:
+                now = self.timers.clock()
+                if self._deadline is None:
+                    self._deadline = now + self.max_delay
+                delay = max(0, min(delay, self._deadline - now))
+            self._timer = self.timers.schedule(delay, self.flush)
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        """ Store pending changes now """
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._deadline = None
+            changes, self._pending = self._pending, {}
+        if not changes:
+            return
+        try:
+            self.store(changes)
+            self.writes += 1
+        except Exception:
+            self.log.exception('Failed to store {}'.format(list(changes)))